@@ -0,0 +1,192 @@
+import os
+import re
+from collections import defaultdict
+from datetime import datetime
+from glob import glob
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import sessionlog
+from utils import read_log
+
+# experiment tasks are named "<floor plan> <strategy>", retries append "trial-N"
+task_name_pattern = re.compile(r"^(?P<base>.*?)(?:trial-(?P<trial>\d+))?$")
+participant_pattern = re.compile(r"participant_(\d+)")
+
+SessionArrays = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def parse_task_name(name: str) -> Tuple[str, int, Optional[str], Optional[str]]:
+    """Split a logged task name into (name, retry, floor plan, strategy)"""
+
+    match = task_name_pattern.match(name)
+    base, trial = match.group("base"), int(match.group("trial") or 0)
+    parts = base.split(" ")
+    if len(parts) == 2 and parts[0].startswith("FloorPlan"):
+        return base, trial, parts[0], parts[1]
+    return base, trial, None, None
+
+
+def session_arrays(log_file: str) -> Tuple[List[str], SessionArrays]:
+    """Names, and (name index, kind, count, seconds, value) of every logged record
+
+    value is the response of survey records. Binary logs are loaded as they are,
+    the JSON logs of earlier versions are converted.
+    """
+
+    if sessionlog.is_session_log(log_file):
+        log = sessionlog.load_columns(log_file)
+        return log.tasks, (log.task, log.kind, log.count, log.wall_ns / 1e9, log.x)
+
+    log = read_log(log_file)
+    records = [
+        (time, name, sessionlog.codes.get(action["action"], sessionlog.OTHER), 0)
+        for name, entries in log["actions"].items()
+        for time, action in entries
+    ]
+    records += [
+        (time, name, sessionlog.SURVEY, response)
+        for name, entries in log["surveys"].items()
+        for time, response in entries
+    ]
+    records.sort(key=lambda record: record[0])
+    names = list(dict.fromkeys(record[1] for record in records))
+    index = {name: i for i, name in enumerate(names)}
+    return names, (
+        np.array([index[record[1]] for record in records], dtype=np.uint16),
+        np.array([record[2] for record in records], dtype=np.uint8),
+        np.ones(len(records), dtype=np.uint32),
+        np.array([datetime.fromisoformat(record[0]).timestamp() for record in records]),
+        np.array([record[3] for record in records], dtype=np.float64),
+    )
+
+
+def summarize_session(log_file: str) -> List[dict]:
+    """One summary per task of a session, with the surveys answered after it"""
+
+    names, (name_index, kind, count, seconds, value) = session_arrays(log_file)
+    match = participant_pattern.search(os.path.basename(log_file))
+    participant = int(match.group(1)) if match else None
+
+    # a survey belongs to the task that logged the last action before it
+    is_survey = kind == sessionlog.SURVEY
+    action_rows = np.flatnonzero(~is_survey)
+    survey_rows = np.flatnonzero(is_survey)
+    previous = np.searchsorted(action_rows, survey_rows) - 1
+    survey_task = np.where(
+        previous >= 0, name_index[action_rows[np.maximum(previous, 0)]], -1
+    )
+
+    summaries = []
+    for task in np.unique(name_index[action_rows]):
+        rows = action_rows[name_index[action_rows] == task]
+        name, trial, floor_plan, strategy = parse_task_name(names[task])
+        actions = np.bincount(
+            kind[rows], weights=count[rows], minlength=len(sessionlog.kinds)
+        )
+        surveys = survey_rows[survey_task == task]
+        summaries.append(
+            dict(
+                session=log_file,
+                participant=participant,
+                task=name,
+                trial=trial,
+                floor_plan=floor_plan,
+                strategy=strategy,
+                seconds=seconds[rows[-1]] - seconds[rows[0]],
+                actions=actions.astype(np.int64),
+                surveys={names[name_index[i]]: value[i] for i in surveys},
+            )
+        )
+    return summaries
+
+
+def bootstrap_ci(
+    values: np.ndarray,
+    resamples: int = 2000,
+    confidence: float = 0.95,
+    rng: Optional[np.random.Generator] = None,
+) -> Tuple[float, float, float]:
+    """Mean and percentile bootstrap confidence interval of the mean"""
+
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return (float("nan"),) * 3
+    rng = rng or np.random.default_rng(0)
+    means = values[rng.integers(0, len(values), (resamples, len(values)))].mean(axis=1)
+    tail = 100 * (1 - confidence) / 2
+    low, high = np.percentile(means, [tail, 100 - tail])
+    return float(values.mean()), float(low), float(high)
+
+
+def aggregate(
+    summaries: List[dict], resamples: int = 2000, seed: int = 0
+) -> Dict[str, dict]:
+    """Statistics per task, or per (floor plan, strategy) for experiment tasks
+
+    Retries count the sessions that needed them, everything else only uses the
+    final attempt of a task in each session.
+    """
+
+    rng = np.random.default_rng(seed)
+    attempts = defaultdict(list)
+    for summary in summaries:
+        attempts[(summary["session"], summary["task"])].append(summary)
+    groups = defaultdict(list)
+    for tries in attempts.values():
+        final = max(tries, key=lambda summary: summary["trial"])
+        final = dict(final, retries=len(tries) - 1)
+        groups[final["task"]].append(final)
+
+    report = {}
+    for task, finals in sorted(groups.items()):
+        actions = np.stack([summary["actions"] for summary in finals])
+        survey_names = sorted({name for s in finals for name in s["surveys"]})
+        report[task] = dict(
+            floor_plan=finals[0]["floor_plan"],
+            strategy=finals[0]["strategy"],
+            sessions=len(finals),
+            retried_sessions=sum(summary["retries"] > 0 for summary in finals),
+            seconds=bootstrap_ci(
+                [summary["seconds"] for summary in finals], resamples, rng=rng
+            ),
+            total_actions=bootstrap_ci(actions.sum(axis=1), resamples, rng=rng),
+            actions={
+                sessionlog.kinds[kind]: float(mean)
+                for kind, mean in enumerate(actions.mean(axis=0))
+                if mean > 0
+            },
+            surveys={
+                name: bootstrap_ci(
+                    [s["surveys"][name] for s in finals if name in s["surveys"]],
+                    resamples,
+                    rng=rng,
+                )
+                for name in survey_names
+            },
+        )
+    return report
+
+
+def analyze_results(
+    results_dir: str = "results",
+    workers: Optional[int] = None,
+    resamples: int = 2000,
+    seed: int = 0,
+) -> Dict[str, dict]:
+    """Summarize every session in results_dir on a process pool and aggregate"""
+
+    # worker telemetry (see telemetry.write_telemetry) sits next to the session logs
+    log_files = sorted(
+        path
+        for pattern in ["*.bin", "*.jsonl", "*.json"]
+        for path in glob(os.path.join(results_dir, pattern))
+        if not path.endswith(".telemetry.jsonl")
+    )
+    summaries = []
+    with Pool(workers) as pool:
+        for session in pool.imap(summarize_session, log_files, chunksize=4):
+            summaries.extend(session)
+    return aggregate(summaries, resamples, seed)
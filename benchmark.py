@@ -0,0 +1,209 @@
+import pickle
+from random import Random
+from statistics import mean
+from time import perf_counter, sleep
+from typing import List, Optional, Tuple
+
+import pygame
+
+from main import Interface
+from simulator.fake import FakeController
+from utils import read_log
+
+# one entry per frame, each a list of ("key", key), ("click",) or ("mouse", dx, dy)
+Script = List[List[tuple]]
+
+
+def generate_script(frames: int, seed: int = 0) -> Script:
+    """Random but repeatable session: looking around, walking and interacting"""
+
+    rng = Random(seed)
+    moves = [pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d]
+    script = []
+    held_key, held_for = None, 0
+    for _ in range(frames):
+        inputs = []
+        if held_for == 0:
+            held_key = rng.choice(moves) if rng.random() < 0.4 else None
+            held_for = rng.randint(5, 30)
+        held_for -= 1
+        if held_key is not None:
+            inputs.append(("key", held_key))
+        if rng.random() < 0.7:
+            inputs.append(("mouse", rng.randint(-8, 8), rng.randint(-3, 3)))
+        roll = rng.random()
+        if roll < 0.01:
+            inputs.append(("key", pygame.K_e))
+        elif roll < 0.02:
+            inputs.append(("key", pygame.K_f))
+        elif roll < 0.04:
+            inputs.append(("click",))
+        script.append(inputs)
+    return script
+
+
+def script_from_log(
+    log_file: str,
+    task: Optional[str] = None,
+    grid_size: float = 0.05,
+    mouse_fraction: float = 0.3,
+) -> Script:
+    """Turn the actions logged in a session back into the inputs that caused them"""
+
+    actions = read_log(log_file)["actions"]
+    logged = sum((actions[name] for name in actions if task in (None, name)), [])
+    keys = dict(
+        MoveAhead=pygame.K_w,
+        MoveLeft=pygame.K_a,
+        MoveBack=pygame.K_s,
+        MoveRight=pygame.K_d,
+        OpenObject=pygame.K_e,
+        CloseObject=pygame.K_e,
+        ToggleObjectOn=pygame.K_f,
+        ToggleObjectOff=pygame.K_f,
+        ThrowObject=pygame.K_q,
+        RotateHeldObject=pygame.K_r,
+    )
+    script = []
+    for _, action in logged:
+        name = action["action"]
+        if name == "RotateRight":
+            script.append([("mouse", round(action["degrees"] / mouse_fraction), 0)])
+        elif name == "LookDown":
+            script.append([("mouse", 0, round(action["degrees"] / mouse_fraction))])
+        elif name == "LookUp":
+            script.append([("mouse", 0, -round(action["degrees"] / mouse_fraction))])
+        elif name.startswith("Move"):
+            repeats = round(action.get("moveMagnitude", grid_size) / grid_size)
+            script.extend([("key", keys[name])] for _ in range(max(repeats, 1)))
+        elif name in keys:
+            script.append([("key", keys[name])])
+        elif name in ["PickupObject", "PutObject", "SliceObject", "DropHandObject"]:
+            script.append([("click",)])
+    return script
+
+
+class ScriptedInterface(Interface):
+    """Interface fed from a script instead of the participant, never waiting on input
+
+    The next scripted frame is only fed once the controller thread has caught up,
+    so the script plays back as fast as the whole pipeline allows. Until then the
+    loop yields briefly on every iteration rather than spinning.
+    """
+
+    def __init__(self, script: Script, *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+        self.script = iter(script)
+        self.loop_iterations = 0
+        self.script_frames = 0
+        self.tasks_run = []  # names of the tasks run, retries included
+
+    def run_task(self, task) -> bool:
+
+        self.tasks_run.append(task.name)
+        return super().run_task(task)
+
+    def poll_input(self) -> Tuple[list, int, int]:
+
+        self.loop_iterations += 1
+        pygame.event.pump()
+        if self.io.busy():
+            sleep(0.001)  # leave the controller thread the interpreter
+            return [], 0, 0
+        try:
+            inputs = next(self.script)
+        except StopIteration:
+            raise KeyboardInterrupt
+        self.script_frames += 1
+        events, dx, dy = [], 0, 0
+        for item in inputs:
+            if item[0] == "key":
+                events.append(pygame.event.Event(pygame.KEYDOWN, key=item[1]))
+            elif item[0] == "click":
+                events.append(
+                    pygame.event.Event(
+                        pygame.MOUSEBUTTONDOWN, button=1, pos=self.simulator_center
+                    )
+                )
+            elif item[0] == "mouse":
+                dx += item[1]
+                dy += item[2]
+        return events, dx, dy
+
+    def wait_for_input(self, timeout: float):
+        pass
+
+
+def run_benchmark(
+    floor_plan: str,
+    script: Script,
+    step_latency: float,
+    banner_func: callable,
+    checklist_func: callable,
+    remote: Optional[callable] = None,
+    **interface_kwargs,
+) -> dict:
+    """remote: builds controllers on a simulator server instead of fake ones"""
+
+    from utils import Task, get_init_steps
+
+    controllers = []
+
+    def controller_factory(**kwargs):
+        if remote is not None:
+            controllers.append(remote(**kwargs))
+        else:
+            controllers.append(FakeController(step_latency=step_latency, **kwargs))
+        return controllers[-1]
+
+    task = Task(
+        name="benchmark",
+        banner_func=banner_func,
+        checklist_func=checklist_func,
+        floor_plan=floor_plan,
+        init_steps=get_init_steps(floor_plan),
+        instructions=None,
+    )
+    E = ScriptedInterface(
+        script,
+        1440,
+        810,
+        "/dev/null",
+        frame_rate=None,
+        controller_factory=controller_factory,
+        **interface_kwargs,
+    )
+    start = perf_counter()
+    E.run_all([task])
+    elapsed = perf_counter() - start
+    state_size = len(pickle.dumps(controllers[-1].last_event))
+    E.clean_up(close=True)
+
+    lag = sorted(E.worker_lag) or [0.0]
+    return dict(
+        fps=E.script_frames / elapsed,
+        script_frames=E.script_frames,
+        seconds=elapsed,
+        loop_iterations=E.loop_iterations,
+        tasks_run=E.tasks_run,
+        controller_steps=sum(c.step_count for c in controllers),
+        resolution=(controllers[-1].width, controllers[-1].height),
+        phase_ms=E.pacing["phase_ms"],
+        idle_frames=E.pacing["idle_frames"],
+        ipc_messages=E.ipc_messages,
+        ipc_megabytes=E.ipc_messages * state_size / 2**20,
+        worker_lag_mean_ms=1000 * mean(lag),
+        worker_lag_p95_ms=1000 * lag[int(0.95 * (len(lag) - 1))],
+        workers={
+            role: dict(
+                function=telemetry.function,
+                calls=telemetry.calls,
+                skipped=telemetry.skipped,
+                queue_wait_p95_ms=telemetry.queue_wait.summary()["p95_ms"],
+                compute_p95_ms=telemetry.compute.summary()["p95_ms"],
+                result_age_p95_ms=telemetry.result_age.summary()["p95_ms"],
+            )
+            for role, telemetry in E.worker_telemetry.items()
+        },
+    )
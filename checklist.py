@@ -1,10 +1,20 @@
 from time import sleep
 from types import SimpleNamespace
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional
 
 from utils import Color, DecoratedString
 
 
+def serving_location(objects: List[dict]) -> Optional[Dict[str, float]]:
+    """Where breakfast is served: the first chair, or the first stool if none"""
+
+    for object_type in ("Chair", "Stool"):
+        for obj in objects:
+            if obj["objectType"] == object_type:
+                return obj["position"]
+    return None
+
+
 class Checklist:
     @staticmethod
     def is_picked_up(state, object_type: str) -> bool:
@@ -75,10 +85,16 @@ class Checklist:
 
 class SandwichChecklist:
 
-    chair_location: Tuple[float, float]
+    chair_location: Dict[str, float]
 
-    def __init__(self):
+    def __init__(self, chair_location: Optional[Dict[str, float]] = None):
+        """
+        chair_location: where breakfast is served, the position of the chair or
+                        stool in the first state by default
+        """
 
+        if chair_location is not None:
+            self.chair_location = chair_location
         self.initialized = False
         self.completed = False
         self.tasks = SimpleNamespace(
@@ -197,11 +213,9 @@ class SandwichChecklist:
 
         if not self.initialized:
             self.initialized = True
-            try:
-                self.chair_location = Checklist.get_position(state, "Chair")
-            except IndexError:
-                self.chair_location = Checklist.get_position(state, "Stool")
-            assert hasattr(self, "chair_location")
+            if not hasattr(self, "chair_location"):
+                self.chair_location = serving_location(state.metadata["objects"])
+            assert self.chair_location is not None
 
         for task, checked in self.tasks.__dict__.items():
             if not checked:
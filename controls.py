@@ -0,0 +1,113 @@
+from copy import copy
+from typing import List
+
+
+class InputCoalescer:
+    """Merge all navigation input gathered within one frame into minimal steps
+
+    Repeated W/A/S/D presses (key repeat) are summed into at most one step per axis,
+    and the mouse deltas into one rotation and one horizon change. When the view
+    changes along both axes, a single Teleport carrying both is issued instead.
+    The flushed actions are the ones sent to the controller, so logging them keeps
+    replays exact.
+    """
+
+    axes = dict(
+        MoveAhead=("forward", 1),
+        MoveBack=("forward", -1),
+        MoveRight=("right", 1),
+        MoveLeft=("right", -1),
+    )
+
+    def __init__(
+        self,
+        grid_size: float,
+        mouse_fraction: float = 0.3,
+        horizon_range: tuple = (-30, 60),
+    ):
+        """
+        grid_size: default move magnitude of the controller
+        mouse_fraction: degrees rotated per pixel of mouse movement
+        horizon_range: (min, max) camera horizon allowed by the controller
+        """
+
+        self.grid_size = grid_size
+        self.mouse_fraction = mouse_fraction
+        self.horizon_range = horizon_range
+        self.reset()
+
+    def reset(self):
+
+        self.forward = 0.0
+        self.right = 0.0
+        self.dx = 0
+        self.dy = 0
+
+    def detach(self) -> "InputCoalescer":
+        """Hand everything gathered so far over to a new coalescer and start afresh"""
+
+        detached = copy(self)
+        self.reset()
+        return detached
+
+    def empty(self) -> bool:
+        return not (self.forward or self.right or self.dx or self.dy)
+
+    def add_move(self, action: dict):
+
+        axis, sign = InputCoalescer.axes[action["action"]]
+        magnitude = action.get("moveMagnitude", self.grid_size)
+        setattr(self, axis, getattr(self, axis) + sign * magnitude)
+
+    def add_mouse(self, dx: int, dy: int):
+
+        self.dx += dx
+        self.dy += dy
+
+    def flush_moves(self) -> List[dict]:
+
+        actions = []
+        for magnitude, positive, negative in [
+            (self.forward, "MoveAhead", "MoveBack"),
+            (self.right, "MoveRight", "MoveLeft"),
+        ]:
+            # opposite keys within the same frame cancel out
+            if abs(magnitude) > 1e-6:
+                actions.append(
+                    dict(
+                        action=positive if magnitude > 0 else negative,
+                        moveMagnitude=round(abs(magnitude), 6),
+                    )
+                )
+        self.forward = 0.0
+        self.right = 0.0
+        return actions
+
+    def flush_look(self, agent: dict) -> List[dict]:
+
+        yaw = self.mouse_fraction * self.dx
+        pitch = self.mouse_fraction * self.dy
+        self.dx = 0
+        self.dy = 0
+        if yaw != 0 and pitch != 0:
+            low, high = self.horizon_range
+            return [
+                dict(
+                    action="Teleport",
+                    rotation=dict(x=0, y=(agent["rotation"]["y"] + yaw) % 360, z=0),
+                    horizon=min(max(agent["cameraHorizon"] + pitch, low), high),
+                    standing=agent["isStanding"],
+                )
+            ]
+        elif yaw != 0:
+            return [dict(action="RotateRight", degrees=yaw)]
+        elif pitch > 0:
+            return [dict(action="LookDown", degrees=pitch)]
+        elif pitch < 0:
+            return [dict(action="LookUp", degrees=-pitch)]
+        return []
+
+    def flush(self, agent: dict) -> List[dict]:
+        """Drain everything gathered so far; agent is the latest agent metadata"""
+
+        return self.flush_moves() + self.flush_look(agent)
@@ -0,0 +1,114 @@
+import heapq
+from collections import namedtuple
+from itertools import count
+from threading import Lock
+from time import monotonic
+from typing import Callable, Iterable, List, Optional
+
+# how long each simulated effect takes, and how it is shown to the participant
+durations = dict(brew=10.0, toast=8.0, cook=12.0)
+labels = dict(brew="brewing", toast="toasting", cook="cooking")
+
+Effect = namedtuple("Effect", ["name", "deadline", "objects", "callback"])
+
+
+class Clock:
+    """Monotonic clock that can run faster than real time or be advanced by hand
+
+    speed: simulated seconds per real second, 0 for a clock that only moves on
+           advance()
+    """
+
+    def __init__(self, speed: float = 1.0):
+
+        self.speed = speed
+        self.origin = monotonic()
+        self.offset = 0.0
+
+    def now(self) -> float:
+        return (monotonic() - self.origin) * self.speed + self.offset
+
+    def advance(self, seconds: float):
+        self.offset += seconds
+
+
+class EffectScheduler:
+    """Timed scene effects (brewing, toasting, cooking) kept in a deadline queue
+
+    Effects are scheduled from the controller thread and their callbacks run there
+    when due; the UI thread only reads deadlines, so access is guarded by a lock.
+    """
+
+    def __init__(self, clock: Clock):
+
+        self.clock = clock
+        self.queue = []
+        self.counter = count()
+        self.lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+    def schedule(
+        self,
+        name: str,
+        objects: Iterable[str],
+        callback: Callable[[], None],
+        duration: Optional[float] = None,
+    ) -> Effect:
+        """objects: ids of the objects involved, busy until the effect fires"""
+
+        deadline = self.clock.now() + (
+            durations[name] if duration is None else duration
+        )
+        effect = Effect(name, deadline, frozenset(objects), callback)
+        with self.lock:
+            heapq.heappush(self.queue, (deadline, next(self.counter), effect))
+        return effect
+
+    def find(self, object_id: str) -> Optional[Effect]:
+        """The pending effect involving the given object, if any"""
+
+        with self.lock:
+            for _, _, effect in self.queue:
+                if object_id in effect.objects:
+                    return effect
+        return None
+
+    def time_left(self, effect: Effect) -> float:
+        return max(effect.deadline - self.clock.now(), 0.0)
+
+    def next_deadline(self) -> Optional[float]:
+        """Simulated seconds until the next effect is due, None if nothing pending"""
+
+        with self.lock:
+            if not self.queue:
+                return None
+            return self.queue[0][0] - self.clock.now()
+
+    def wake_in(self) -> Optional[float]:
+        """Real seconds until the next effect is due, None if nothing to wake for"""
+
+        left = self.next_deadline()
+        if left is None or self.clock.speed <= 0:
+            return None
+        return max(left / self.clock.speed, 0.0)
+
+    def due(self) -> bool:
+
+        left = self.next_deadline()
+        return left is not None and left <= 0
+
+    def fire_due(self) -> List[Effect]:
+        """Pop every effect that is due and run its callback, in deadline order"""
+
+        fired = []
+        now = self.clock.now()
+        while True:
+            with self.lock:
+                if not self.queue or self.queue[0][0] > now:
+                    break
+                _, _, effect = heapq.heappop(self.queue)
+            effect.callback()
+            fired.append(effect)
+        return fired
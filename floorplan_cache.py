@@ -0,0 +1,274 @@
+"""Per floor plan artifacts computed offline from the initialized scene
+
+Artifacts are stored as one .npz per floorplans.json entry and grid size, named
+after a hash of both, so a changed config simply misses the cache (and the stale
+file is pruned the next time the cache is built).
+"""
+
+import hashlib
+import json
+import os
+from collections import namedtuple
+from functools import lru_cache
+from glob import escape, glob
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from checklist import serving_location
+from utils import get_floorplan_config, get_init_steps
+
+default_cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+# part of the cache key, bump when the artifacts change
+version = 3
+
+# objects with a walking distance field, "Chair" stands for chair_location
+distance_targets = ["Mug", "CoffeeMachine", "Bread", "Knife", "Plate", "Chair"]
+
+FloorPlanArtifacts = namedtuple(
+    "FloorPlanArtifacts",
+    [
+        "grid_size",  # () grid the reachable positions are on
+        "reachable",  # (N, 3) reachable agent positions
+        "object_ids",  # (M,) objectId of every object after the init steps
+        "object_types",  # (M,) objectType of every object
+        "object_positions",  # (M, 3) position of every object
+        "openable",  # (K,) objectIds that can be opened
+        "toggleable",  # (L,) objectIds that can be toggled
+        "chair_location",  # (3,) where breakfast is served, see serving_location
+        "cell_size",  # () spacing of the reachable positions
+        "grid_origin",  # (2,) x and z of grid cell (0, 0)
+        "grid_index",  # (H, W) index into reachable of each cell, -1 if blocked
+        "distance_targets",  # (T,) names of the targets of distance_fields
+        "distance_fields",  # (T, N) walking distance from each reachable position
+    ],
+)
+
+
+def xyz(position: dict) -> List[float]:
+    return [position["x"], position["y"], position["z"]]
+
+
+def scene_name(floor_plan: str) -> str:
+    """The simulator scene of a config entry, e.g. FloorPlan5_tutorial_coffee"""
+
+    return floor_plan.split("_")[0]
+
+
+def config_hash(floor_plan: str, grid_size: float) -> str:
+
+    config = json.dumps(
+        dict(
+            config=get_floorplan_config(floor_plan),
+            grid_size=grid_size,
+            version=version,
+        ),
+        sort_keys=True,
+    )
+    return hashlib.sha1(config.encode()).hexdigest()[:16]
+
+
+def cache_path(
+    floor_plan: str, grid_size: float, cache_dir: Optional[str] = None
+) -> str:
+
+    return os.path.join(
+        cache_dir or default_cache_dir,
+        "{}-grid{}-{}.npz".format(
+            floor_plan, grid_size, config_hash(floor_plan, grid_size)
+        ),
+    )
+
+
+def reachable_grid(
+    reachable: np.ndarray, grid_size: float
+) -> Tuple[float, np.ndarray, np.ndarray]:
+    """Lay the reachable positions out on a grid, returns (cell size, origin, index)"""
+
+    xz = reachable[:, [0, 2]].astype(np.float64)
+    steps = np.diff(np.unique(np.round(xz[:, 0], 3)))
+    cell_size = round(float(steps.min()), 4) if len(steps) else grid_size
+    origin = xz.min(axis=0) if len(xz) else np.zeros(2)
+    cells = np.round((xz - origin) / cell_size).astype(np.int64)
+    shape = cells.max(axis=0) + 1 if len(cells) else (0, 0)
+    grid_index = np.full(shape, -1, dtype=np.int32)
+    grid_index[cells[:, 0], cells[:, 1]] = np.arange(len(cells))
+    return cell_size, origin, grid_index
+
+
+def distance_field(
+    grid_index: np.ndarray, cell_size: float, sources: np.ndarray
+) -> np.ndarray:
+    """Walking distance from every reachable position to the nearest source
+
+    Relaxes all cells against their 8 neighbours at once until nothing changes,
+    i.e. Bellman-Ford over the grid, vectorized with NumPy.
+    sources: indices into the reachable positions
+    """
+
+    blocked = grid_index < 0
+    distance = np.full(grid_index.shape, np.inf)
+    cells = np.argwhere(~blocked)[np.argsort(grid_index[~blocked])]
+    distance[tuple(cells[sources].T)] = 0
+    moves = [
+        (di, dj, cell_size * np.hypot(di, dj))
+        for di in (-1, 0, 1)
+        for dj in (-1, 0, 1)
+        if di or dj
+    ]
+    height, width = grid_index.shape
+    while True:
+        padded = np.pad(distance, 1, constant_values=np.inf)
+        relaxed = distance.copy()
+        for di, dj, cost in moves:
+            neighbour = padded[1 + di : 1 + di + height, 1 + dj : 1 + dj + width]
+            np.minimum(relaxed, neighbour + cost, out=relaxed)
+        relaxed[blocked] = np.inf
+        if np.array_equal(relaxed, distance):
+            return distance[tuple(cells.T)].astype(np.float32)
+        distance = relaxed
+
+
+def target_sources(
+    reachable: np.ndarray, targets: np.ndarray, reach: float
+) -> np.ndarray:
+    """Reachable positions within reach of any target, or else the closest one"""
+
+    offsets = reachable[:, None, [0, 2]] - targets[None, :, [0, 2]]
+    gaps = np.hypot(offsets[..., 0], offsets[..., 1]).min(axis=1)
+    sources = np.flatnonzero(gaps <= reach)
+    return sources if len(sources) else np.array([np.argmin(gaps)])
+
+
+def compute_artifacts(
+    controller, floor_plan: str, grid_size: float, reach: float = 0.85
+) -> FloorPlanArtifacts:
+    """Initialize a floor plan and derive its artifacts from the resulting metadata
+
+    controller: a pipeline.RenderOnDemand
+    reach: distance within which an object counts as reached by the agent
+    """
+
+    event = controller.reset(scene=scene_name(floor_plan), gridSize=grid_size)
+    for step in get_init_steps(floor_plan):
+        event = controller.step(**step, render=False)
+    objects = event.metadata["objects"]
+    reachable = controller.step(action="GetReachablePositions", render=False)
+    # the same as SandwichChecklist derives from the first state of a task
+    chair_location = serving_location(objects) or dict(x=np.nan, y=np.nan, z=np.nan)
+    reachable = np.array(
+        [xyz(x) for x in reachable.metadata["actionReturn"]], dtype=np.float32
+    ).reshape(-1, 3)
+    object_types = np.array([x["objectType"] for x in objects], dtype=str)
+    object_positions = np.array(
+        [xyz(x["position"]) for x in objects], dtype=np.float32
+    ).reshape(-1, 3)
+    cell_size, grid_origin, grid_index = reachable_grid(reachable, grid_size)
+    fields = []
+    for target in distance_targets:
+        if target == "Chair":
+            positions = np.array([xyz(chair_location)], dtype=np.float32)
+        else:
+            positions = object_positions[object_types == target]
+        if len(reachable) and len(positions) and np.isfinite(positions).all():
+            sources = target_sources(reachable, positions, reach)
+            fields.append(distance_field(grid_index, cell_size, sources))
+        else:
+            fields.append(np.full(len(reachable), np.inf, dtype=np.float32))
+    return FloorPlanArtifacts(
+        grid_size=np.array(grid_size),
+        reachable=reachable,
+        object_ids=np.array([x["objectId"] for x in objects], dtype=str),
+        object_types=object_types,
+        object_positions=object_positions,
+        openable=np.array([x["objectId"] for x in objects if x["openable"]], dtype=str),
+        toggleable=np.array(
+            [x["objectId"] for x in objects if x["toggleable"]], dtype=str
+        ),
+        chair_location=np.array(xyz(chair_location), dtype=np.float32),
+        cell_size=np.array(cell_size),
+        grid_origin=grid_origin,
+        grid_index=grid_index,
+        distance_targets=np.array(distance_targets, dtype=str),
+        distance_fields=np.array(fields, dtype=np.float32).reshape(
+            len(distance_targets), len(reachable)
+        ),
+    )
+
+
+def walking_distance(
+    artifacts: FloorPlanArtifacts, position: Dict[str, float], target: str
+) -> float:
+    """Walking distance from a position to where target (see distance_targets) is
+    within reach, looked up in the cell of the position
+
+    Positions off the reachable grid use the closest reachable position instead.
+    """
+
+    x, z = position["x"], position["z"]
+    i, j = np.round((np.array([x, z]) - artifacts.grid_origin) / artifacts.cell_size)
+    height, width = artifacts.grid_index.shape
+    index = (
+        artifacts.grid_index[int(i), int(j)]
+        if 0 <= i < height and 0 <= j < width
+        else -1
+    )
+    if index < 0:
+        offsets = artifacts.reachable[:, [0, 2]] - np.array([x, z])
+        index = np.argmin((offsets**2).sum(axis=1))
+    row = np.flatnonzero(artifacts.distance_targets == target)[0]
+    return float(artifacts.distance_fields[row, index])
+
+
+def save_artifacts(artifacts: FloorPlanArtifacts, path: str):
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial_path = path + ".partial.npz"
+    np.savez_compressed(partial_path, **artifacts._asdict())
+    os.replace(partial_path, path)
+
+
+@lru_cache(maxsize=None)
+def load_artifacts(
+    floor_plan: str, grid_size: float = 0.05, cache_dir: Optional[str] = None
+) -> Optional[FloorPlanArtifacts]:
+    """The cached artifacts of a floor plan, None if not precomputed for its config"""
+
+    try:
+        with np.load(cache_path(floor_plan, grid_size, cache_dir)) as data:
+            return FloorPlanArtifacts(
+                **{field: data[field] for field in FloorPlanArtifacts._fields}
+            )
+    except FileNotFoundError:
+        return None
+
+
+def build_cache(
+    controller,
+    floor_plans: Iterable[str],
+    grid_size: float = 0.05,
+    cache_dir: Optional[str] = None,
+) -> List[str]:
+    """Compute and store the artifacts of each floor plan missing from the cache
+
+    Returns the paths written. Files of earlier configs of these floor plans (on the
+    same grid) are removed.
+    """
+
+    written = []
+    for floor_plan in floor_plans:
+        path = cache_path(floor_plan, grid_size, cache_dir)
+        if os.path.exists(path):
+            continue
+        save_artifacts(compute_artifacts(controller, floor_plan, grid_size), path)
+        written.append(path)
+        for stale in glob(
+            os.path.join(
+                os.path.dirname(path),
+                "{}-grid{}-*.npz".format(escape(floor_plan), grid_size),
+            )
+        ):
+            if stale != path:
+                os.remove(stale)
+    load_artifacts.cache_clear()
+    return written
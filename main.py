@@ -1,18 +1,62 @@
+import os
 import pdb
 import queue as _queue
 from copy import deepcopy
+from functools import partial
 from multiprocessing import Queue
-from pprint import pprint  # noqa
+from pprint import pprint
 from random import shuffle
 from time import time
-from typing import List, Optional, Union
+from typing import Callable, List, Optional, Tuple, Union
 
-import ai2thor.controller as controller
-import fire
-import pygame
-from ai2thor.platform import CloudRendering
+from controls import InputCoalescer
+from effects import Clock, EffectScheduler, labels
+from pipeline import (
+    AdaptiveResolution,
+    ControllerThread,
+    Frame,
+    FrameScheduler,
+    RenderOnDemand,
+)
+from rendering import Compositor, FrameRenderer, TextCache, reproject
+from scenes import SceneCache
+from telemetry import write_telemetry
+from tracing import make_tracer
+from trajectory import TrajectoryRecorder
+from utils import (
+    AsyncFuncWrapper,
+    Color,
+    DecoratedString,
+    Logger,
+    Survey,
+    Task,
+    lazy_import,
+)
 
-from utils import AsyncFuncWrapper, Color, DecoratedString, Logger, Survey, Task
+# only loaded once used, so entry points that don't need them start fast
+controller = lazy_import("ai2thor.controller")
+floorplan_cache = lazy_import("floorplan_cache")
+pygame = lazy_import("pygame")
+
+
+def cloud_rendering_controller(**kwargs):
+
+    from ai2thor.platform import CloudRendering
+
+    return controller.Controller(platform=CloudRendering, **kwargs)
+
+
+def remote_controller_factory(
+    server: Optional[str], encoding: str = "jpeg"
+) -> Optional[Callable]:
+    """Controllers on the simulator server at "host:port", None without a server"""
+
+    if server is None:
+        return None
+
+    from remote import RemoteController, parse_address
+
+    return partial(RemoteController, parse_address(str(server)), encoding)
 
 
 class Interface:
@@ -37,9 +81,39 @@ class Interface:
 
     """
 
-    def __init__(self, width: int, height: int, log_file: str):
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        log_file: str,
+        reprojection: bool = False,
+        frame_rate: Optional[int] = 60,
+        controller_factory: Optional[Callable] = None,
+        target_latency: Optional[float] = None,
+        clock_speed: float = 1.0,
+        record_trajectories: bool = False,
+        trace: str = "off",
+    ):
+        """
+        reprojection: while a look step is in flight, shift the last frame by the
+                      pending rotation instead of showing it unchanged
+        frame_rate: target frame rate of the task loop, None to run unpaced
+        controller_factory: builds the controller for each task, defaults to an
+                            ai2thor Controller on CloudRendering (see
+                            simulator.fake.FakeController for a headless one)
+        target_latency: when given, lower or raise the render resolution to hold
+                        this controller step latency (in seconds)
+        clock_speed: how fast timed effects like brewing coffee run compared to
+                     real time, e.g. to not wait on them in automated runs
+        record_trajectories: record the metadata after every controller step of a
+                             task, next to the log file (see trajectory.Trajectory)
+        trace: trace controller steps to stderr, "off", "info" or "debug" (see
+               tracing.levels)
+        """
 
         self.logger = Logger(log_file)
+        if log_file != os.devnull:  # task telemetry is appended for the session
+            open(os.path.splitext(log_file)[0] + ".telemetry.jsonl", "w").close()
         pygame.init()
         self.simulator_width = width
         self.simulator_height = height
@@ -63,6 +137,7 @@ class Interface:
             self.simulator_height // 2 + self.y_offset,
         )
         self.simulator_top_left = (0, self.y_offset + 5)
+        self.simulator_bbox = (*self.simulator_top_left, width, height)
         self.banner_bbox = (0, 0, self.overall_width, self.y_offset)  # (x, y, w, h)
         self.banner_top_left = (0, 0)
         self.checklist_bbox = (
@@ -100,11 +175,27 @@ class Interface:
             (self.overall_width // 2 + 1.8 * self.x_offset, self.overall_height // 2),
         ]
         pygame.key.set_repeat(30)
-
-        self.mktext_tiny = pygame.font.SysFont(None, self.text_size_tiny).render
-        self.mktext_small = pygame.font.SysFont(None, self.text_size_small).render
-        self.mktext_medium = pygame.font.SysFont(None, self.text_size_medium).render
-        self.mktext_large = pygame.font.SysFont(None, self.text_size_large).render
+        self.grid_size = 0.05
+        self.mouse_fraction = 0.3
+        self.field_of_view = 60
+        self.horizon_range = (-30, 60)
+        self.reprojection = reprojection
+        self.frame_rate = frame_rate
+        self.target_latency = target_latency
+        self.clock_speed = clock_speed
+        self.record_trajectories = record_trajectories
+        self.tracer = make_tracer(trace)
+        self.controller_factory = controller_factory or cloud_rendering_controller
+        self.simulator = None
+        self.scenes = SceneCache()
+        self.renderer = FrameRenderer()
+        self.compositor = Compositor(self.screen)
+
+        self.text_cache = TextCache()
+        self.mktext_tiny = self.text_cache.renderer(self.text_size_tiny)
+        self.mktext_small = self.text_cache.renderer(self.text_size_small)
+        self.mktext_medium = self.text_cache.renderer(self.text_size_medium)
+        self.mktext_large = self.text_cache.renderer(self.text_size_large)
         self.show_loading("Loading everything")
 
         (self.pipe_to_banner, self.pipe_from_banner) = (Queue(), Queue())
@@ -130,8 +221,9 @@ class Interface:
                 res = self.run_task(task1)
                 cnt = 1
                 while not res:
-                    task1 = deepcopy(task)
-                    task1.name = original_name + "trial-{}".format(cnt)
+                    task1 = deepcopy(task)._replace(
+                        name=original_name + "trial-{}".format(cnt)
+                    )
                     res = self.run_task(task1)
                     cnt += 1
             elif isinstance(task, Survey):
@@ -153,9 +245,11 @@ class Interface:
 
         if text != self.banner_text:
             self.screen.fill(Color.white, self.banner_bbox)
-            text = self.mktext_medium(text, True, Color.black)
-            self.screen.blit(text, self.banner_top_left)
+            self.screen.blit(
+                self.mktext_medium(text, True, Color.black), self.banner_top_left
+            )
             self.banner_text = text
+            self.compositor.mark(self.banner_bbox)
 
     def update_checklist(self, texts: List[DecoratedString]):
 
@@ -167,11 +261,25 @@ class Interface:
                 top += self.text_size_small
                 self.screen.blit(text, (left, top))
             self.checklist_text = texts
-
-    def update_simulator(self, object_meta: Optional[dict] = None):
-
-        image = self.state.frame.transpose((1, 0, 2))
-        self.screen.blit(pygame.surfarray.make_surface(image), self.simulator_top_left)
+            self.compositor.mark(self.checklist_bbox)
+
+    def update_simulator(self, frame: Frame, look: Tuple[float, float] = (0, 0)):
+        """look: (yaw, pitch) in degrees not yet reflected in the frame"""
+
+        object_meta = frame.object_meta
+        image = frame.state.frame
+        if look != (0, 0):
+            horizon = frame.state.metadata["agent"]["cameraHorizon"]
+            low, high = self.horizon_range
+            yaw, pitch = look
+            pitch = min(max(horizon + pitch, low), high) - horizon
+            image = reproject(image, yaw, pitch, self.field_of_view)
+        self.screen.blit(
+            self.renderer.render(image, self.simulator_bbox[2:]),
+            self.simulator_top_left,
+        )
+        # the crosshair and tooltips are drawn within the simulator view
+        self.compositor.mark(self.simulator_bbox)
         pygame.draw.circle(
             self.screen, Color.white, self.simulator_center, self.dot_size
         )
@@ -179,12 +287,12 @@ class Interface:
         pickupable = True
         if object_meta is not None:
             object_name = object_meta["objectType"]
-            if self.coffee_timer is not None:
-                if object_meta["objectId"] in [self.coffee_machine, self.mug]:
-                    object_name += " (brewing... {:.1f}sec left)".format(
-                        10 - time() + self.coffee_timer
-                    )
-                    pickupable = False
+            effect = self.effects.find(object_meta["objectId"])
+            if effect is not None:
+                object_name += " ({}... {:.1f}sec left)".format(
+                    labels[effect.name], self.effects.time_left(effect)
+                )
+                pickupable = False
             text = self.mktext_tiny(object_name, True, Color.white)
             self.screen.blit(text, self.simulator_center_right)
             text_y += self.text_size_tiny
@@ -215,7 +323,55 @@ class Interface:
                     self.screen.blit(text, (text_x, text_y))
                     text_y += self.text_size_tiny
 
-    def set_object_pose(self, positions: dict, rotations: dict):
+    def poll_input(self) -> Tuple[list, int, int]:
+        """Gather this frame's events and the mouse movement since the last frame"""
+
+        events = pygame.event.get()
+        x, y = pygame.mouse.get_pos()
+        pygame.mouse.set_pos(self.simulator_center)
+        return events, x - self.simulator_center[0], y - self.simulator_center[1]
+
+    def wait_for_input(self, timeout: float):
+        """Block until an event arrives or timeout (in seconds) expires"""
+
+        event = pygame.event.wait(max(int(1000 * timeout), 1))
+        if event.type != pygame.NOEVENT:
+            pygame.event.post(event)
+
+    def snapshot(self, hover: bool = True) -> Frame:
+        """Query the object under the cursor and package the state for display
+
+        hover: whether to query the object under the cursor, otherwise the previous
+               one is reused
+        """
+
+        if hover:
+            query = self.controller.step(
+                action="GetObjectInFrame", x=0.5, y=0.48, render=False
+            )
+            self.object_id = query.metadata["actionReturn"] if query else None
+        return Frame(self.state, self.state.get_object(self.object_id))
+
+    def run_commands(self, commands: List[callable], hover: bool = True) -> Frame:
+        """Runs on the controller thread: apply the queued input then snapshot"""
+
+        for command in commands:
+            command()
+        self.effects.fire_due()
+        state = self.controller.adapt_resolution()
+        if state is not None:
+            self.state = state
+        return self.snapshot(hover)
+
+    def apply_input(self, coalescer: InputCoalescer):
+
+        actions = coalescer.flush(self.state.metadata["agent"])
+        for i, action in enumerate(actions):
+            self.logger.log_action(self.current_task, action)
+            # only the final state of a batch can end up on screen
+            self.state = self.controller.step(**action, render=i == len(actions) - 1)
+
+    def set_object_pose(self, positions: dict, rotations: dict, render: bool = True):
 
         objects = [
             dict(
@@ -227,10 +383,10 @@ class Interface:
             if x["moveable"] or x["pickupable"]
         ]
         action = dict(action="SetObjectPoses", objectPoses=objects)
-        self.state = self.controller.step(**action)
+        self.state = self.controller.step(**action, render=render)
         self.logger.log_action(self.current_task, action)
 
-    def init_coffee(self, coffee_machine: str):
+    def start_brewing(self, coffee_machine: str):
 
         mug_obj = [x for x in self.state.metadata["objects"] if "Mug" in x["name"]][0]
         mug = mug_obj["objectId"]
@@ -238,9 +394,51 @@ class Interface:
             mug_obj["isFilledWithLiquid"]
             and coffee_machine in mug_obj["parentReceptacles"]
         ):
-            self.coffee_timer = time()
-            self.coffee_machine = coffee_machine
-            self.mug = mug
+            self.effects.schedule(
+                "brew",
+                [coffee_machine, mug],
+                partial(self.finish_brewing, coffee_machine, mug),
+            )
+
+    def finish_brewing(self, coffee_machine: str, mug: str):
+
+        self.controller.step(
+            action="ToggleObjectOff",
+            objectId=coffee_machine,
+            forceAction=True,
+            render=False,
+        )
+        self.state = self.controller.step(
+            action="FillObjectWithLiquid",
+            objectId=mug,
+            fillLiquid="coffee",
+            forceAction=True,
+        )
+
+    def handle_key(self, key: int):
+
+        try:
+            # object interaction with E/F
+            action_dict = self.toggleables[key]
+            (action, alternative) = action_dict[self.object_id]
+            action_dict[self.object_id] = (alternative, action)
+            action = dict(action=action, objectId=self.object_id)
+        except KeyError:
+            action = self.discrete_key_binding.get(key, None)
+        if action is not None:
+            self.logger.log_action(self.current_task, action)
+            self.state = self.controller.step(**action)
+            if (
+                action["action"] == "ToggleObjectOn"
+                and "CoffeeMachine" in self.object_id
+                and self.effects.find(self.object_id) is None
+            ):
+                self.start_brewing(self.object_id)
+
+    def handle_click(self):
+
+        if self.object_id is not None:
+            self.handle_mouse_click(self.object_id)
 
     def handle_mouse_click(self, objectId: str):
 
@@ -279,16 +477,18 @@ class Interface:
                     self.object_in_hand = None
                     self.has_knife = False
                     if "CoffeeMachine" in objectId:
-                        self.init_coffee(objectId)
+                        self.start_brewing(objectId)
                 elif "Slice" in self.object_in_hand:
                     position_pointing = self.controller.step(
                         action="GetCoordinateFromRaycast",
                         x=0.50,
                         y=0.48,
+                        render=False,
                     ).metadata["actionReturn"]
                     self.set_object_pose(
                         {self.object_in_hand: position_pointing},
                         {self.object_in_hand: dict(x=90, y=0, z=0)},
+                        render=False,
                     )
                     action = dict(action="DropHandObject", forceAction=True)
                     self.state = self.controller.step(**action)
@@ -298,15 +498,17 @@ class Interface:
         if action is not None:
             self.logger.log_action(self.current_task, action)
 
-        # coffee specific
+        # the mug stays in the coffee machine until brewing is done
+        effect = self.effects.find(self.object_in_hand)
         if (
-            self.coffee_timer is not None
-            and self.object_in_hand == self.mug
-            and self.state.get_object(self.mug)["isFilledWithLiquid"]
+            effect is not None
+            and effect.name == "brew"
+            and self.state.get_object(self.object_in_hand)["isFilledWithLiquid"]
         ):
+            (coffee_machine,) = effect.objects - {self.object_in_hand}
             self.state = self.controller.step(
                 action="PutObject",
-                objectId=self.coffee_machine,
+                objectId=coffee_machine,
                 forceAction=True,
             )
             self.object_in_hand = None
@@ -316,51 +518,83 @@ class Interface:
         # initialization
         self.show_loading("Loading")
         keyclick = pygame.time.Clock()
+        coalescer = InputCoalescer(
+            self.grid_size, self.mouse_fraction, self.horizon_range
+        )
         self.banner = AsyncFuncWrapper(
             task.banner_func, self.pipe_to_banner, self.pipe_from_banner
         )
-        self.checklist = AsyncFuncWrapper(
-            task.checklist_func, self.pipe_to_checklist, self.pipe_from_checklist
-        )
-        self.controller = controller.Controller(
-            platform=CloudRendering,
-            scene=task.floor_plan,
-            width=self.simulator_width,
-            height=self.simulator_height,
-            gridSize=0.05,
-            snapToGrid=False,
-            fieldOfView=60,
+        # tasks without a checklist_func get both from the banner worker
+        combined = task.checklist_func is None
+        self.checklist = None
+        if not combined:
+            self.checklist = AsyncFuncWrapper(
+                task.checklist_func, self.pipe_to_checklist, self.pipe_from_checklist
+            )
+        resolution = None
+        if self.target_latency is not None:
+            resolution = AdaptiveResolution(
+                (self.simulator_width, self.simulator_height), self.target_latency
+            )
+        # one simulator for all tasks, reset to the next task's scene
+        if self.simulator is None:
+            self.simulator = self.controller_factory(
+                scene=task.floor_plan,
+                width=self.simulator_width,
+                height=self.simulator_height,
+                gridSize=self.grid_size,
+                snapToGrid=False,
+                fieldOfView=self.field_of_view,
+            )
+        else:
+            self.simulator.reset(
+                scene=task.floor_plan,
+                width=self.simulator_width,
+                height=self.simulator_height,
+            )
+        self.controller = RenderOnDemand(self.simulator, resolution, tracer=self.tracer)
+        if self.record_trajectories:
+            self.controller.recorder = TrajectoryRecorder(
+                "{}-{}.traj".format(
+                    os.path.splitext(self.logger.log_file)[0], task.name
+                )
+            )
+        self.state = self.scenes.start(
+            self.controller, task.floor_plan, task.init_steps
         )
-        self.state = self.controller.step(action="Teleport")
-        for action in task.init_steps:
-            self.state = self.controller.step(**action)
-            pprint(self.state)
+        if self.tracer is not None:
+            self.tracer.start_task(name=task.name, floor_plan=task.floor_plan)
         self.banner_text = ""
         self.checklist_text = []
         self.current_task = task.name
 
-        # simulator specific
-        toggleables = {
-            pygame.K_e: {
-                obj["objectId"]: ("OpenObject", "CloseObject")
-                for obj in self.state.metadata["objects"]
-                if obj["openable"]
-            },
+        # simulator specific, precomputed when the floor plan cache is built
+        artifacts = floorplan_cache.load_artifacts(task.floor_plan, self.grid_size)
+        if artifacts is not None:
+            openable, toggleable = artifacts.openable, artifacts.toggleable
+        else:
+            objects = self.state.metadata["objects"]
+            openable = [obj["objectId"] for obj in objects if obj["openable"]]
+            toggleable = [obj["objectId"] for obj in objects if obj["toggleable"]]
+        self.toggleables = {
+            pygame.K_e: {str(x): ("OpenObject", "CloseObject") for x in openable},
             pygame.K_f: {
-                obj["objectId"]: ("ToggleObjectOn", "ToggleObjectOff")
-                for obj in self.state.metadata["objects"]
-                if obj["toggleable"]
+                str(x): ("ToggleObjectOn", "ToggleObjectOff") for x in toggleable
             },
         }
         self.object_in_hand = None
         self.has_knife = False
-        self.coffee_timer = None
+        self.effects = EffectScheduler(Clock(self.clock_speed))
+        frame = self.snapshot()
 
         # load up models
-        self.pipe_to_banner.put(self.state)
-        self.pipe_to_checklist.put(self.state)
-        banner = self.pipe_from_banner.get()
-        checklist = self.pipe_from_checklist.get()
+        self.banner.send(self.state)
+        if combined:
+            banner, checklist = self.banner.receive()
+        else:
+            self.checklist.send(self.state)
+            banner = self.banner.receive()
+            checklist = self.checklist.receive()
 
         # loop
         if task.instructions is not None:
@@ -369,125 +603,198 @@ class Interface:
         pygame.mouse.set_pos(self.simulator_center)
         self.update_banner(banner)
         self.update_checklist(checklist)
-        self.update_simulator(None)
+        self.update_simulator(frame)
+        waiting_banner = waiting_checklist = False
+        self.ipc_messages = 0
+        self.worker_lag = []  # seconds from sending a state to its result
+        sent = {}
+
+        # from here on the controller is only driven from its own thread, the loop
+        # below queues up input as commands and displays whatever frame is latest
+        self.io = ControllerThread()
+        scheduler = FrameScheduler(self.frame_rate)
+        commands = []
+        queued_look = (0, 0)  # gathered but not yet submitted
+        inflight_look = (0, 0)  # submitted but not yet displayed
         try:
             while banner is not None and checklist is not None:
 
-                old_state = self.state
-                query = self.controller.step(action="GetObjectInFrame", x=0.5, y=0.48)
-                objectId = query.metadata["actionReturn"] if query else None
-
-                # handle keyboard & mouse click
-                for event in pygame.event.get():
+                with scheduler.phase("input"):
 
-                    if event.type == pygame.KEYDOWN:
-                        action = None
-                        try:
-                            # navigating with W/A/S/D
-                            action = self.key_binding[event.key]
-                        except KeyError:
-                            if keyclick.tick() > 250:
-                                # object interaction with E/F
-                                try:
-                                    action_dict = toggleables[event.key]
-                                    (action, alternative) = action_dict[objectId]
-                                    action_dict[objectId] = (alternative, action)
-                                    action = dict(action=action, objectId=objectId)
-                                except KeyError:
-                                    action = self.discrete_key_binding.get(
-                                        event.key, None
-                                    )
+                    # handle keyboard & mouse click
+                    events, dx, dy = self.poll_input()
+                    for event in events:
 
+                        if event.type == pygame.KEYDOWN:
+                            try:
+                                # navigating with W/A/S/D, merged into one step per job
+                                coalescer.add_move(self.key_binding[event.key])
+                            except KeyError:
+                                if keyclick.tick() > 250:
                                     # quit
                                     if event.key == pygame.K_ESCAPE:
                                         raise KeyboardInterrupt
                                     elif event.key == pygame.K_p:
                                         pdb.set_trace()
                                     elif event.key == pygame.K_n:
-                                        self.logger.save()
-                                        self.clean_up(close=False)
-                                        self.controller.step(action="Done")
+                                        self.finish_task(task, scheduler)
                                         return False
-                        finally:
-                            if action is not None:
-                                self.logger.log_action(task.name, action)
-                                self.state = self.controller.step(**action)
-                                if (
-                                    action["action"] == "ToggleObjectOn"
-                                    and "CoffeeMachine" in objectId
-                                    and self.coffee_timer is None
-                                ):
-                                    self.init_coffee(objectId)
-
-                    elif event.type == pygame.MOUSEBUTTONDOWN and objectId is not None:
-
-                        self.handle_mouse_click(objectId)
-
-                # handle mouse movement
-                x, y = pygame.mouse.get_pos()
-                dx, dy = x - self.simulator_center[0], y - self.simulator_center[1]
-                pygame.mouse.set_pos(self.simulator_center)
-                if dx != 0:
-                    action = dict(action="RotateRight", degrees=0.3 * dx)
-                    self.logger.log_action(task.name, action)
-                    self.state = self.controller.step(action)
-                if dy > 0:
-                    action = dict(action="LookDown", degrees=abs(0.3 * dy))
-                    self.logger.log_action(task.name, action)
-                    self.state = self.controller.step(action)
-                elif dy < 0:
-                    action = dict(action="LookUp", degrees=abs(0.3 * dy))
-                    self.logger.log_action(task.name, action)
-                    self.state = self.controller.step(action)
-                pygame.mouse.set_pos(self.simulator_center)
-
-                if self.coffee_timer is not None and time() - self.coffee_timer > 10:
-                    self.coffee_timer = None
-                    self.controller.step(
-                        action="ToggleObjectOff",
-                        objectId=self.coffee_machine,
-                        forceAction=True,
+                                    else:
+                                        commands.append(
+                                            partial(
+                                                self.apply_input, coalescer.detach()
+                                            )
+                                        )
+                                        commands.append(
+                                            partial(self.handle_key, event.key)
+                                        )
+
+                        elif event.type == pygame.MOUSEBUTTONDOWN:
+
+                            commands.append(
+                                partial(self.apply_input, coalescer.detach())
+                            )
+                            commands.append(self.handle_click)
+
+                    # handle mouse movement
+                    coalescer.add_mouse(dx, dy)
+                    queued_look = (
+                        queued_look[0] + self.mouse_fraction * dx,
+                        queued_look[1] + self.mouse_fraction * dy,
                     )
-                    self.state = self.controller.step(
-                        action="FillObjectWithLiquid",
-                        objectId=self.mug,
-                        fillLiquid="coffee",
-                        forceAction=True,
+                    had_input = bool(events) or dx != 0 or dy != 0
+                    counting_down = (
+                        frame.object_meta is not None
+                        and self.effects.find(frame.object_meta["objectId"]) is not None
                     )
 
-                # update display
-                self.pipe_to_banner.put(self.state)
-                self.pipe_to_checklist.put(self.state)
-                if old_state != self.state or self.coffee_timer is not None:
-                    self.update_simulator(self.state.get_object(objectId))
-                try:
-                    banner = self.pipe_from_banner.get_nowait()
-                except _queue.Empty:
-                    pass
-                else:
-                    if banner is None:
-                        raise KeyboardInterrupt
+                # submit the next step once the previous one has completed, when
+                # behind schedule keep coalescing navigation and skip the hover query
+                with scheduler.phase("simulator"):
+                    if (
+                        not self.io.busy()
+                        and (commands or not scheduler.degraded)
+                        and (commands or not coalescer.empty() or self.effects.due())
+                    ):
+                        commands.append(partial(self.apply_input, coalescer.detach()))
+                        self.io.submit(
+                            partial(
+                                self.run_commands,
+                                commands,
+                                hover=not scheduler.degraded,
+                            )
+                        )
+                        commands = []
+                        inflight_look, queued_look = queued_look, (0, 0)
+                    latest = self.io.latest()
+
+                # workers only see new states, and the same state again while their
+                # output keeps changing (they may need several passes to settle)
+                with scheduler.phase("workers"):
+                    if latest is not None:
+                        frame = latest
+                        if not self.io.busy():
+                            inflight_look = (0, 0)
+                        self.banner.send(frame.state)
+                        self.ipc_messages += 1
+                        sent.setdefault("banner", time())
+                        waiting_banner = True
+                        if not combined:
+                            self.checklist.send(frame.state)
+                            self.ipc_messages += 1
+                            sent.setdefault("checklist", time())
+                            waiting_checklist = True
+                    try:
+                        result = self.banner.receive(block=False)
+                    except _queue.Empty:
+                        pass
                     else:
-                        self.update_banner(banner)
-                try:
-                    checklist = self.pipe_from_checklist.get_nowait()
-                except _queue.Empty:
-                    pass
+                        if result is None:
+                            raise KeyboardInterrupt
+                        self.worker_lag.append(time() - sent.pop("banner", time()))
+                        if combined:
+                            waiting_banner = result != (banner, checklist)
+                            banner, checklist = result
+                        else:
+                            waiting_banner = result != banner
+                            banner = result
+                        if waiting_banner:
+                            self.banner.send(frame.state)
+                            self.ipc_messages += 1
+                    if not combined:
+                        try:
+                            result = self.checklist.receive(block=False)
+                        except _queue.Empty:
+                            pass
+                        else:
+                            if result is None:
+                                raise KeyboardInterrupt
+                            self.worker_lag.append(
+                                time() - sent.pop("checklist", time())
+                            )
+                            waiting_checklist = result != checklist
+                            if waiting_checklist:
+                                self.checklist.send(frame.state)
+                                self.ipc_messages += 1
+                            checklist = result
+
+                # update display
+                with scheduler.phase("render"):
+                    look = (
+                        queued_look[0] + inflight_look[0],
+                        queued_look[1] + inflight_look[1],
+                    )
+                    if self.reprojection and look != (0, 0):
+                        self.update_simulator(frame, look)
+                    elif latest is not None or counting_down:
+                        self.update_simulator(frame)
+                    self.update_banner(banner)
+                    self.update_checklist(checklist)
+                    self.compositor.present()
+
+                # when nothing is going on, block until input arrives or the next
+                # effect is due, polling the workers and refreshing a countdown under
+                # the crosshair at a low rate
+                if had_input or commands or self.io.busy() or latest is not None:
+                    scheduler.end_frame()
                 else:
-                    if checklist is None:
-                        raise KeyboardInterrupt
-                    else:
-                        self.update_checklist(checklist)
-                pygame.display.flip()
+                    timeout = 0.05 if waiting_banner or waiting_checklist else 0.25
+                    if counting_down:
+                        timeout = min(timeout, 0.1)
+                    wake_in = self.effects.wake_in()
+                    if wake_in is not None:
+                        timeout = min(timeout, wake_in)
+                    self.wait_for_input(timeout)
+                    scheduler.idle()
 
         except KeyboardInterrupt:
             pass
 
         # clean up
+        self.finish_task(task, scheduler)
+        return True
+
+    def finish_task(self, task: Task, scheduler: FrameScheduler):
+        """Wind down a task, whether it is done or about to be retried"""
+
+        self.pacing = scheduler.report()
+        self.worker_telemetry = {"banner": self.banner.telemetry}
+        if self.checklist is not None:
+            self.worker_telemetry["checklist"] = self.checklist.telemetry
+        if self.logger.log_file != os.devnull:
+            write_telemetry(
+                os.path.splitext(self.logger.log_file)[0] + ".telemetry.jsonl",
+                task.name,
+                self.worker_telemetry,
+                self.pacing,
+            )
+        self.io.stop()
+        if self.controller.recorder is not None:
+            self.controller.recorder.close()
+            self.controller.recorder = None
         self.logger.save()
         self.clean_up(close=False)
         self.controller.step(action="Done")
-        return True
 
     def show_survey(self, survey: Survey) -> int:
 
@@ -600,13 +907,24 @@ class Interface:
 
         self.show_loading("cleaning up")
         self.banner.kill()
-        self.checklist.kill()
+        if self.checklist is not None:
+            self.checklist.kill()
+        for pipe in [
+            self.pipe_to_banner,
+            self.pipe_from_banner,
+            self.pipe_to_checklist,
+            self.pipe_from_checklist,
+        ]:
+            pipe.cancel_join_thread()  # the other end is gone, drop what's left
         self.pipe_to_banner.close()
         self.pipe_from_banner.close()
         self.pipe_to_checklist.close()
         self.pipe_from_checklist.close()
 
         if close:
+            if self.simulator is not None:
+                self.simulator.stop()
+            self.logger.close()
             pygame.display.quit()
             pygame.quit()
         else:
@@ -620,12 +938,21 @@ def dummy():
 
     from dummy import dummy_procedures
 
-    E = Interface(1440, 810, "log.json")
+    E = Interface(1440, 810, "log.bin")
     E.run_all(dummy_procedures)
     E.clean_up(close=True)
 
 
-def tour(floor_plan: str = "FloorPlan10"):
+def tour(
+    floor_plan: str = "FloorPlan10",
+    trace: str = "off",
+    server: Optional[str] = None,
+    encoding: str = "jpeg",
+):
+    """
+    server: "host:port" of a simulator server to use (see serve)
+    encoding: frame encoding asked of the server, "jpeg" or lossless "delta"
+    """
 
     from utils import get_init_steps
 
@@ -640,17 +967,23 @@ def tour(floor_plan: str = "FloorPlan10"):
             "by providing suggestions.",
         ],
     )
-    E = Interface(1440, 810, "log.json")
+    E = Interface(
+        1440,
+        810,
+        "log.bin",
+        controller_factory=remote_controller_factory(server, encoding),
+        trace=trace,
+    )
     E.run_all([task])
     E.clean_up(close=True)
 
 
 def tutorial():
 
-    from tutorial import tutorials
+    from tutorial import get_tutorials
 
-    E = Interface(1440, 810, "log.json")
-    E.run_all(tutorials)
+    E = Interface(1440, 810, "log.bin")
+    E.run_all(get_tutorials())
     E.clean_up(close=True)
 
 
@@ -678,7 +1011,7 @@ def train(floor_plan: str = "FloorPlan5"):
         )
         for i in range(3)
     ]
-    E = Interface(1440, 810, "log.json")
+    E = Interface(1440, 810, "log.bin")
     E.run_all(training)
     E.clean_up(close=True)
 
@@ -702,17 +1035,190 @@ def test(floor_plan: str = "FloorPlan5", model: str = "empty"):
             floor_plan=floor_plan,
         )
     ]
-    E = Interface(1440, 810, "log.json")
+    E = Interface(1440, 810, "log.bin")
     E.run_all(tasks)
     E.clean_up(close=True)
 
 
-def experiment(trial: int):
+def precompute(
+    floor_plans: Optional[Union[str, List[str]]] = None,
+    grid_size: float = 0.05,
+    fake: bool = False,
+    cache_dir: Optional[str] = None,
+):
+    """Build the floor plan artifact cache, see floorplan_cache
+
+    floor_plans: entries of floorplans.json to build, all of them by default
+    fake: run on simulator.fake.FakeController instead of ai2thor
+    """
+
+    from floorplan_cache import build_cache, scene_name
+    from utils import load_floorplans_config
+
+    if isinstance(floor_plans, str):
+        floor_plans = [floor_plans]
+    floor_plans = floor_plans or list(load_floorplans_config())
+    if fake:
+        from simulator.fake import FakeController as controller_factory
+    else:
+        controller_factory = cloud_rendering_controller
+    simulator = controller_factory(
+        scene=scene_name(floor_plans[0]), gridSize=grid_size, snapToGrid=False
+    )
+    written = build_cache(RenderOnDemand(simulator), floor_plans, grid_size, cache_dir)
+    simulator.stop()
+    pprint(written)
+
+
+def benchmark(
+    floor_plan: str = "FloorPlan5",
+    frames: int = 1000,
+    step_latency: float = 0.01,
+    strategy: str = "coffee_first",
+    session: Optional[str] = None,
+    task: Optional[str] = None,
+    seed: int = 0,
+    target_latency: Optional[float] = None,
+    clock_speed: float = 100.0,
+    trace: str = "off",
+    server: Optional[str] = None,
+    encoding: str = "jpeg",
+):
+    """Headless end-to-end throughput of the task loop on a fake controller
+
+    Reports fps as scripted frames played back per second, loop_iterations counts
+    every pass of the task loop including those waiting on the controller.
+
+    session: replay the inputs of a logged session (optionally only one task of
+             it) instead of a generated script of the given number of frames
+    target_latency: enable adaptive render resolution with this target
+    clock_speed: speed-up of timed effects, so brewing does not hold up the run
+    trace: trace controller steps to stderr (see tracing.levels)
+    server: step a simulator server at "host:port" (e.g. serve --fake) instead
+    encoding: frame encoding asked of the server, "jpeg" or "delta"
+    """
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+    from benchmark import generate_script, run_benchmark, script_from_log
+    from checklist import SandwichChecklist
+    from models import get_model
+
+    if session is None:
+        script = generate_script(frames, seed)
+    else:
+        script = script_from_log(session, task)
+    report = run_benchmark(
+        floor_plan,
+        script,
+        step_latency,
+        get_model(floor_plan, strategy),
+        SandwichChecklist(),
+        target_latency=target_latency,
+        clock_speed=clock_speed,
+        trace=trace,
+        remote=remote_controller_factory(server, encoding),
+    )
+    pprint(report)
+
+
+def analyze(
+    results_dir: str = "results",
+    workers: Optional[int] = None,
+    resamples: int = 2000,
+    seed: int = 0,
+    output: Optional[str] = None,
+):
+    """Completion time, action counts, retries and surveys over all sessions
+
+    Means come with bootstrap confidence intervals as (mean, low, high).
+    output: also write the report as JSON to this file
+    """
+
+    import json
+
+    from analysis import analyze_results
+
+    report = analyze_results(results_dir, workers, resamples, seed)
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    pprint(report)
+
+
+def check_startup(budget: float = 0.25, repeats: int = 5):
+    """Fail when importing main takes longer than budget seconds, best of repeats
+
+    Each import runs in a fresh interpreter, like every invocation of this script.
+    """
+
+    import subprocess
+    import sys
+
+    code = "from time import perf_counter as t; s = t(); import main; print(t() - s)"
+    seconds = min(
+        float(
+            subprocess.run(
+                [sys.executable, "-c", code],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.split()[-1]
+        )
+        for _ in range(repeats)
+    )
+    print("importing main took {:.3f}s (budget {:.3f}s)".format(seconds, budget))
+    if seconds > budget:
+        sys.exit("startup is over budget")
+
+
+def serve(
+    host: str = "localhost",
+    port: int = 8765,
+    fake: bool = False,
+    max_width: int = 1440,
+    max_height: int = 810,
+    step_latency: float = 0.0,
+):
+    """Run the simulator for participant stations connecting with --server
+
+    Each station gets its own controller. Use host="0.0.0.0" to accept stations
+    from other machines.
+    fake: serve simulator.fake.FakeController (with step_latency) instead of ai2thor
+    max_width, max_height: largest resolution rendered for a station
+    """
+
+    from remote import SimulatorServer
+
+    if fake:
+        from simulator.fake import FakeController
+
+        controller_factory = partial(FakeController, step_latency=step_latency)
+    else:
+        controller_factory = cloud_rendering_controller
+    server = SimulatorServer(
+        (host, port), controller_factory, max_size=(max_width, max_height)
+    )
+    print("serving the simulator on {}:{}".format(*server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def experiment(trial: int, server: Optional[str] = None, encoding: str = "jpeg"):
+    """
+    server: "host:port" of a simulator server to use (see serve)
+    encoding: frame encoding asked of the server, "jpeg" or lossless "delta"
+    """
 
     from checklist import SandwichChecklist
     from models import get_model
     from survey import post_task_surveys, post_train_surveys
-    from tutorial import tutorials
+    from tutorial import get_tutorials
     from utils import get_init_steps, welcome
 
     all_floor_plans = ["FloorPlan9", "FloorPlan10", "FloorPlan6"]
@@ -755,17 +1261,38 @@ def experiment(trial: int):
 
     procedures = [
         welcome,
-        *tutorials,
+        *get_tutorials(),
         *training,
         *post_train_surveys,
         *sum([[task] + post_task_surveys for task in tasks], []),
     ]
     E = Interface(
-        1440, 810, "results/result_participant_{:02d}-{}.json".format(trial, time())
+        1440,
+        810,
+        "results/result_participant_{:02d}-{}.bin".format(trial, time()),
+        controller_factory=remote_controller_factory(server, encoding),
+        record_trajectories=True,
     )
     E.run_all(procedures)
     E.clean_up(close=True)
 
 
 if __name__ == "__main__":
-    fire.Fire()
+    import fire
+
+    # name the commands, letting fire inspect the module would load the lazy imports
+    fire.Fire(
+        dict(
+            dummy=dummy,
+            precompute=precompute,
+            tour=tour,
+            tutorial=tutorial,
+            train=train,
+            test=test,
+            benchmark=benchmark,
+            analyze=analyze,
+            check_startup=check_startup,
+            serve=serve,
+            experiment=experiment,
+        )
+    )
@@ -1,13 +1,47 @@
+from math import hypot
 from time import sleep
 
+import numpy as np
+
 from checklist import Checklist, SandwichChecklist
-from utils import floorplans_config
+from floorplan_cache import load_artifacts, walking_distance
+from utils import get_floorplan_config
+
+
+def make_checklist(artifacts) -> SandwichChecklist:
+    """A checklist serving breakfast at the precomputed chair location, if any
+
+    The location is checklist.serving_location of the task's first state either way,
+    the same as the checklist shown to the participant.
+    """
+
+    if artifacts is None or not np.isfinite(artifacts.chair_location).all():
+        return SandwichChecklist()
+    x, y, z = (float(v) for v in artifacts.chair_location)
+    return SandwichChecklist(dict(x=x, y=y, z=z))
+
+
+def distance_to(artifacts, checklist: SandwichChecklist, state, target: str) -> float:
+    """Walking distance from the agent to target (see floorplan_cache.distance_targets)
+
+    Falls back to the straight-line distance when the floor plan is not precomputed.
+    """
+
+    agent = Checklist.get_position(state, "Agent")
+    if artifacts is not None:
+        return walking_distance(artifacts, agent, target)
+    if target == "Chair":
+        position = checklist.chair_location
+    else:
+        position = Checklist.get_position(state, target)
+    return hypot(agent["x"] - position["x"], agent["z"] - position["z"])
 
 
 class ActionSequenceModel:
     def __init__(self, floor_plan: str):
-        self.checklist = SandwichChecklist()
-        self.floor_plan_config = floorplans_config.get(floor_plan, {})
+        self.artifacts = load_artifacts(floor_plan)
+        self.checklist = make_checklist(self.artifacts)
+        self.floor_plan_config = get_floorplan_config(floor_plan)
         self.current_step = 0
         self.total_steps = len(self.checkpoints)
 
@@ -235,21 +269,29 @@ class InterleaveModel(ActionSequenceModel):
 
 class GreedyModel:
     def __init__(self, floor_plan: str):
-        self.checklist = SandwichChecklist()
-        self.floor_plan_config = floorplans_config.get(floor_plan, {})
+        self.artifacts = load_artifacts(floor_plan)
+        self.checklist = make_checklist(self.artifacts)
+        self.floor_plan_config = get_floorplan_config(floor_plan)
         self.checkpoints = {"get_mug": None}
         self.instructions = {}
         self.distance = {}
         self.dependency = {}
 
+    def walking_distance(self, state: dict, target: str) -> float:
+        return distance_to(self.artifacts, self.checklist, state, target)
+
     def __call__(self, state: dict) -> str:
         raise NotImplementedError
 
 
 class MinDistanceModel:
     def __init__(self, floor_plan: str):
-        self.checklist = SandwichChecklist()
-        self.floor_plan_config = floorplans_config.get(floor_plan, {})
+        self.artifacts = load_artifacts(floor_plan)
+        self.checklist = make_checklist(self.artifacts)
+        self.floor_plan_config = get_floorplan_config(floor_plan)
+
+    def walking_distance(self, state: dict, target: str) -> float:
+        return distance_to(self.artifacts, self.checklist, state, target)
 
     def __call__(self, state: dict) -> str:
         raise NotImplementedError
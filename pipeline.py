@@ -0,0 +1,273 @@
+import queue as _queue
+from collections import namedtuple
+from contextlib import contextmanager
+from threading import Lock, Thread
+from time import perf_counter, sleep
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Frame = namedtuple("Frame", ["state", "object_meta"])
+
+
+class ControllerThread(Thread):
+    """Run all controller I/O on a dedicated thread
+
+    The UI thread submits jobs (callables that drive the controller) through a
+    request queue and picks up the most recent completed result from a double
+    buffer, so event handling and display never block on a simulator step.
+    """
+
+    def __init__(self):
+
+        super().__init__()
+        self.daemon = True
+        self.requests = _queue.Queue()
+        self.buffers = [None, None]
+        self.front = 0
+        self.fresh = False
+        self.pending = 0
+        self.error = None
+        self.lock = Lock()
+        self.start()
+
+    def run(self):
+
+        job = self.requests.get()
+        while job is not None:
+            try:
+                result = job()
+            except Exception as e:  # surfaced on the UI thread
+                with self.lock:
+                    self.error = e
+                    self.pending -= 1
+            else:
+                back = 1 - self.front
+                self.buffers[back] = result
+                with self.lock:
+                    self.front = back
+                    self.fresh = True
+                    self.pending -= 1
+            job = self.requests.get()
+
+    def submit(self, job: Callable[[], Any]):
+
+        with self.lock:
+            self.pending += 1
+        self.requests.put(job)
+
+    def busy(self) -> bool:
+        return self.pending > 0
+
+    def latest(self) -> Any:
+        """Return the newest completed result, or None if nothing new arrived"""
+
+        with self.lock:
+            if self.error is not None:
+                raise self.error
+            if not self.fresh:
+                return None
+            self.fresh = False
+            return self.buffers[self.front]
+
+    def stop(self):
+        """Finish all submitted jobs then exit the thread"""
+
+        self.requests.put(None)
+        self.join()
+
+
+class AdaptiveResolution:
+    """Lower or raise the render resolution to hold a target step latency
+
+    The latency of rendered steps is tracked as a moving average. When it drifts
+    out of the band around the target, the resolution is scaled down or back up
+    towards the full size, within bounds and no more often than every few steps.
+    """
+
+    def __init__(
+        self,
+        size: Tuple[int, int],
+        target_latency: float,
+        min_scale: float = 0.4,
+        scale_step: float = 0.15,
+        smoothing: float = 0.2,
+        cooldown: int = 10,
+    ):
+        """
+        size: full resolution, also the upper bound
+        target_latency: step latency to hold, in seconds
+        min_scale: lower bound of the resolution as a fraction of the full size
+        scale_step: change of scale per adjustment
+        smoothing: weight of the newest sample in the moving average
+        cooldown: rendered steps to wait between adjustments
+        """
+
+        self.size = size
+        self.target_latency = target_latency
+        self.min_scale = min_scale
+        self.scale_step = scale_step
+        self.smoothing = smoothing
+        self.cooldown = cooldown
+        self.scale = 1.0
+        self.latency = None
+        self.since_change = 0
+
+    def record(self, seconds: float):
+
+        self.since_change += 1
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += self.smoothing * (seconds - self.latency)
+
+    def adjust(self) -> Optional[Tuple[int, int]]:
+        """Return the new resolution when it should change, None otherwise"""
+
+        if self.latency is None or self.since_change < self.cooldown:
+            return None
+        if self.latency > 1.2 * self.target_latency and self.scale > self.min_scale:
+            scale = max(self.scale - self.scale_step, self.min_scale)
+        elif self.latency < 0.6 * self.target_latency and self.scale < 1.0:
+            scale = min(self.scale + self.scale_step, 1.0)
+        else:
+            return None
+        self.scale = scale
+        self.latency = None
+        self.since_change = 0
+        width, height = self.size
+        return (int(width * scale) // 2 * 2, int(height * scale) // 2 * 2)
+
+
+class RenderOnDemand:
+    """Controller wrapper that lets steps opt out of rendering
+
+    step(..., render=False) asks the simulator to skip the image for steps that are
+    only needed for their metadata or return value. Only a rendered step's frame may
+    be displayed. Rendered steps are timed for resolution, if given, except with
+    timed=False, and every step is handed to recorder and tracer, if given (see
+    trajectory.TrajectoryRecorder and tracing.Tracer).
+    """
+
+    def __init__(
+        self,
+        controller,
+        resolution: Optional[AdaptiveResolution] = None,
+        recorder: Optional[Any] = None,
+        tracer: Optional[Any] = None,
+    ):
+
+        self.controller = controller
+        self.resolution = resolution
+        self.recorder = recorder
+        self.tracer = tracer
+
+    def __getattr__(self, name: str):
+        return getattr(self.controller, name)
+
+    def step(self, action=None, render: bool = True, timed: bool = True, **action_args):
+
+        if self.recorder is not None or self.tracer is not None:
+            recorded = dict(action) if isinstance(action, dict) else dict(action=action)
+            recorded.update(action_args)
+        if not render:
+            action_args["renderImage"] = False
+        start = perf_counter()
+        event = self.controller.step(action, **action_args)
+        seconds = perf_counter() - start
+        if render and timed and self.resolution is not None:
+            self.resolution.record(seconds)
+        if self.recorder is not None:
+            self.recorder.record(recorded, event.metadata)
+        if self.tracer is not None:
+            self.tracer.step(recorded, event, seconds)
+        return event
+
+    def adapt_resolution(self) -> Optional[Any]:
+        """Apply a pending resolution change, returning the new rendered event"""
+
+        if self.resolution is not None:
+            size = self.resolution.adjust()
+            if size is not None:
+                width, height = size
+                # resizing is no sample of the latency at the new resolution
+                return self.step(
+                    action="ChangeResolution", x=width, y=height, timed=False
+                )
+        return None
+
+
+class FrameScheduler:
+    """Pace a loop at a target frame rate and account for where each frame goes
+
+    Each frame is split into named phases that get a share of the frame budget. A
+    frame that overruns its deadline is counted as missed and marks the scheduler as
+    degraded for the next frame, so the loop can shed optional work.
+    """
+
+    default_budget = dict(input=0.1, simulator=0.2, workers=0.2, render=0.5)
+
+    def __init__(
+        self, frame_rate: Optional[int] = 60, budget: Optional[Dict[str, float]] = None
+    ):
+        """
+        frame_rate: target frames per second, or None to run unpaced
+        budget: fraction of the frame period for each phase
+        """
+
+        self.period = 1 / frame_rate if frame_rate else 0.0
+        self.budget = budget or FrameScheduler.default_budget
+        self.spent = {phase: 0.0 for phase in self.budget}
+        self.overruns = {phase: 0 for phase in self.budget}
+        self.frames = 0
+        self.idle_frames = 0
+        self.missed = 0
+        self.degraded = False
+        self.frame_start = perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            self.spent[name] += elapsed
+            if self.period and elapsed > self.budget[name] * self.period:
+                self.overruns[name] += 1
+
+    def end_frame(self):
+        """Sleep until the frame deadline, or record the miss if already past it"""
+
+        deadline = self.frame_start + self.period
+        now = perf_counter()
+        self.frames += 1
+        self.degraded = self.period > 0 and now > deadline
+        if not self.period:
+            self.frame_start = now
+        elif self.degraded:
+            self.missed += 1
+            self.frame_start = now
+        else:
+            sleep(deadline - now)
+            self.frame_start = deadline
+
+    def idle(self):
+        """Start the next frame now, after the loop blocked waiting for input"""
+
+        self.idle_frames += 1
+        self.degraded = False
+        self.frame_start = perf_counter()
+
+    def report(self) -> dict:
+
+        frames = max(self.frames, 1)
+        return dict(
+            frames=self.frames,
+            idle_frames=self.idle_frames,
+            missed=self.missed,
+            miss_rate=self.missed / frames,
+            phase_ms={
+                phase: 1000 * spent / frames for phase, spent in self.spent.items()
+            },
+            phase_overruns=dict(self.overruns),
+        )
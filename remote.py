@@ -0,0 +1,309 @@
+"""Run the simulator on a server and the pygame front-end on participant stations
+
+A simulator server owns one controller per connected station. The station uses a
+RemoteController, a drop-in for ai2thor.controller.Controller (pass it as the
+Interface's controller_factory), that forwards every step over a socket and gets
+back the resulting event. Events are streamed compactly: metadata as the fields
+that changed since the previous event (see trajectory.flatten), and rendered frames
+either as JPEG or losslessly as zlib-compressed differences to the previous frame.
+
+Every message is a (kind, fields size, blob size) header, zlib-compressed JSON
+fields and an opaque blob holding the encoded frame, if any. On connecting, the
+station asks for a resolution and frame encoding and the server answers with what
+it will use, never more pixels than its max_size.
+"""
+
+import json
+import socket
+import socketserver
+import struct
+import zlib
+from io import BytesIO
+from typing import Any, BinaryIO, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from trajectory import diff, flatten, unflatten
+
+HELLO, WELCOME, STEP, RESET, EVENT, ERROR, STOP = range(7)
+message_header = struct.Struct("<BII")
+
+encodings = ["jpeg", "delta"]
+NO_FRAME, JPEG, KEYFRAME, DELTA = range(4)
+
+
+def to_json(value: Any) -> Any:
+    """NumPy values in metadata, e.g. of simulator.fake, as plain Python"""
+
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(
+        "Object of type {} is not JSON serializable".format(type(value).__name__)
+    )
+
+
+def send_message(stream: BinaryIO, kind: int, fields: dict, blob: bytes = b""):
+
+    data = zlib.compress(json.dumps(fields, default=to_json).encode(), 1)
+    stream.write(message_header.pack(kind, len(data), len(blob)))
+    stream.write(data)
+    stream.write(blob)
+    stream.flush()
+
+
+def receive_message(stream: BinaryIO) -> Tuple[int, dict, bytes]:
+
+    header = stream.read(message_header.size)
+    if len(header) < message_header.size:
+        raise ConnectionError("connection closed")
+    kind, fields_size, blob_size = message_header.unpack(header)
+    data = stream.read(fields_size)
+    blob = stream.read(blob_size)
+    if len(data) < fields_size or len(blob) < blob_size:
+        raise ConnectionError("connection closed mid-message")
+    return kind, json.loads(zlib.decompress(data)), blob
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """(host, port) from "host:port" or ":port" (localhost)"""
+
+    host, _, port = address.rpartition(":")
+    return host or "localhost", int(port)
+
+
+def negotiate(
+    width: int, height: int, max_size: Optional[Tuple[int, int]]
+) -> Tuple[int, int]:
+    """The requested resolution, scaled down to fit max_size keeping its aspect"""
+
+    if max_size is None:
+        return width, height
+    scale = min(1.0, max_size[0] / width, max_size[1] / height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+class FrameEncoder:
+    def __init__(self, encoding: str = "jpeg", quality: int = 85):
+
+        self.encoding = encoding
+        self.quality = quality
+        self.previous = None
+
+    def encode(self, frame: Optional[np.ndarray]) -> Tuple[int, bytes]:
+
+        if frame is None:
+            return NO_FRAME, b""
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        if self.encoding == "jpeg":
+            data = BytesIO()
+            Image.fromarray(frame).save(data, "JPEG", quality=self.quality)
+            return JPEG, data.getvalue()
+        if self.previous is not None and self.previous.shape == frame.shape:
+            codec, data = DELTA, frame - self.previous  # wraps around, as uint8
+        else:
+            codec, data = KEYFRAME, frame
+        self.previous = frame
+        return codec, zlib.compress(data.tobytes(), 1)
+
+
+class FrameDecoder:
+    def __init__(self):
+        self.previous = None
+
+    def decode(
+        self, codec: int, shape: Optional[list], data: bytes
+    ) -> Optional[np.ndarray]:
+
+        if codec == NO_FRAME:
+            return None
+        if codec == JPEG:
+            image = Image.open(BytesIO(data))
+            return np.asarray(image if image.mode == "RGB" else image.convert("RGB"))
+        frame = np.frombuffer(zlib.decompress(data), np.uint8).reshape(shape)
+        if codec == DELTA:
+            frame = self.previous + frame
+        self.previous = frame
+        return frame
+
+
+class SimulatorHandler(socketserver.StreamRequestHandler):
+    """Serve one station: create its controller, then step it on request"""
+
+    def handle(self):
+
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        kind, hello, _ = receive_message(self.rfile)
+        if kind != HELLO:
+            return
+        max_size = self.server.max_size
+        width, height = negotiate(hello["width"], hello["height"], max_size)
+        encoding = hello["encoding"] if hello["encoding"] in encodings else "jpeg"
+        controller = self.server.controller_factory(
+            **hello["controller"], width=width, height=height
+        )
+        encoder = FrameEncoder(encoding, hello.get("quality", 85))
+        send_message(
+            self.wfile, WELCOME, dict(width=width, height=height, encoding=encoding)
+        )
+        previous = {}
+        try:
+            while True:
+                kind, request, _ = receive_message(self.rfile)
+                if kind == STOP:
+                    break
+                try:
+                    if kind == RESET:
+                        if "width" in request and "height" in request:
+                            request["width"], request["height"] = negotiate(
+                                request["width"], request["height"], max_size
+                            )
+                        event = controller.reset(**request)
+                    else:
+                        if request.get("action") == "ChangeResolution":
+                            request["x"], request["y"] = negotiate(
+                                request["x"], request["y"], max_size
+                            )
+                        event = controller.step(**request)
+                except Exception as e:  # raised again on the station
+                    send_message(self.wfile, ERROR, dict(error=repr(e)))
+                    continue
+                flat = flatten(event.metadata)
+                changed, removed = diff(previous, flat)
+                previous = flat
+                codec, blob = encoder.encode(event.frame)
+                shape = None if event.frame is None else list(event.frame.shape)
+                send_message(
+                    self.wfile,
+                    EVENT,
+                    dict(changed=changed, removed=removed, codec=codec, shape=shape),
+                    blob,
+                )
+        except ConnectionError:
+            pass  # the station went away
+        finally:
+            controller.stop()
+
+
+class SimulatorServer(socketserver.ThreadingTCPServer):
+    """Accept any number of stations, each with its own controller and thread"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        controller_factory: Callable,
+        max_size: Optional[Tuple[int, int]] = None,
+    ):
+
+        super().__init__(address, SimulatorHandler)
+        self.controller_factory = controller_factory
+        self.max_size = max_size
+
+
+class RemoteEvent:
+    """Stand-in for ai2thor.server.Event received from a simulator server
+
+    Pickling leaves out the frame, so the workers that get sent states only receive
+    their metadata.
+    """
+
+    def __init__(self, metadata: dict, frame: Optional[np.ndarray]):
+        self.metadata = metadata
+        self.frame = frame
+
+    def __bool__(self):
+        return bool(self.metadata.get("lastActionSuccess"))
+
+    def __getstate__(self) -> dict:
+        return dict(metadata=self.metadata, frame=None)
+
+    def get_object(self, object_id: str) -> Optional[dict]:
+
+        for obj in self.metadata["objects"]:
+            if obj["objectId"] == object_id:
+                return obj
+        return None
+
+
+class RemoteController:
+    """Drop-in for ai2thor.controller.Controller that runs on a simulator server
+
+    address: (host, port) of the server
+    encoding: "jpeg" (lossy, at quality) or "delta" (lossless) frames
+    width, height: requested resolution, the server may lower it
+    kwargs: passed on to the controller on the server
+    """
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        encoding: str = "jpeg",
+        quality: int = 85,
+        width: int = 300,
+        height: int = 300,
+        **kwargs
+    ):
+
+        self.connection = socket.create_connection(address)
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stream = self.connection.makefile("rwb")
+        send_message(
+            self.stream,
+            HELLO,
+            dict(
+                width=width,
+                height=height,
+                encoding=encoding,
+                quality=quality,
+                controller=kwargs,
+            ),
+        )
+        kind, welcome, _ = receive_message(self.stream)
+        self.width, self.height = welcome["width"], welcome["height"]
+        self.encoding = welcome["encoding"]
+        self.decoder = FrameDecoder()
+        self.flat: Dict[str, Any] = {}
+        self.step_count = 0
+        self.last_event = None
+
+    def request(self, kind: int, fields: dict) -> RemoteEvent:
+
+        send_message(self.stream, kind, fields)
+        kind, reply, blob = receive_message(self.stream)
+        if kind == ERROR:
+            raise RuntimeError("simulator server: " + reply["error"])
+        self.flat.update(reply["changed"])
+        for path in reply["removed"]:
+            del self.flat[path]
+        frame = self.decoder.decode(reply["codec"], reply["shape"], blob)
+        if frame is not None:
+            self.height, self.width = frame.shape[:2]
+        self.last_event = RemoteEvent(unflatten(self.flat), frame)
+        return self.last_event
+
+    def step(self, action=None, **action_args) -> RemoteEvent:
+
+        if isinstance(action, dict):
+            action_args = dict(action, **action_args)
+        elif action is not None:
+            action_args["action"] = action
+        self.step_count += 1
+        return self.request(STEP, action_args)
+
+    def reset(self, scene: Optional[str] = None, **kwargs) -> RemoteEvent:
+
+        if scene is not None:
+            kwargs["scene"] = scene
+        return self.request(RESET, kwargs)
+
+    def stop(self):
+
+        try:
+            send_message(self.stream, STOP, {})
+        except OSError:
+            pass  # the server is already gone
+        self.stream.close()
+        self.connection.close()
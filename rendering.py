@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from functools import partial
+from math import radians, tan
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils import lazy_import
+
+np = lazy_import("numpy")
+pygame = lazy_import("pygame")
+
+
+def reproject(
+    frame: np.ndarray, yaw: float, pitch: float, field_of_view: float
+) -> np.ndarray:
+    """Approximate the view after turning by (yaw, pitch) degrees by shifting a frame
+
+    frame: (height, width, 3) image as returned by the simulator
+    yaw: degrees turned right
+    pitch: degrees looked down
+    field_of_view: vertical field of view of the camera in degrees
+
+    Pixels uncovered by the shift are filled by repeating the edge of the frame.
+    """
+
+    height, width = frame.shape[:2]
+    focal = height / 2 / tan(radians(field_of_view / 2))
+    shift_x = int(round(focal * tan(radians(max(min(yaw, 89), -89)))))
+    shift_y = int(round(focal * tan(radians(max(min(pitch, 89), -89)))))
+    if shift_x == 0 and shift_y == 0:
+        return frame
+    rows = np.clip(np.arange(height) + shift_y, 0, height - 1)
+    cols = np.clip(np.arange(width) + shift_x, 0, width - 1)
+    return frame[np.ix_(rows, cols)]
+
+
+class FrameRenderer:
+    """Turn simulator frames into surfaces without per-frame allocation
+
+    One surface is kept per resolution, backed by a persistent (height, width, 3)
+    buffer, so showing a frame is a single contiguous copy into that buffer rather
+    than a transpose followed by a fresh surface from make_surface. Frames rendered
+    below the display size are upscaled into another persistent surface.
+    """
+
+    surfaces: Dict[Tuple[int, int], Tuple[np.ndarray, pygame.Surface]]
+    scaled: Dict[Tuple[int, int], pygame.Surface]
+
+    def __init__(self):
+
+        self.surfaces = {}
+        self.scaled = {}
+
+    def render(
+        self, frame: np.ndarray, size: Optional[Tuple[int, int]] = None
+    ) -> pygame.Surface:
+        """size: (width, height) to show the frame at, defaults to the frame size"""
+
+        height, width = frame.shape[:2]
+        try:
+            buffer, surface = self.surfaces[(width, height)]
+        except KeyError:
+            buffer = np.empty((height, width, 3), dtype=np.uint8)
+            surface = pygame.image.frombuffer(buffer, (width, height), "RGB")
+            self.surfaces[(width, height)] = (buffer, surface)
+        np.copyto(buffer, frame, casting="unsafe")
+        if size is None or size == (width, height):
+            return surface
+        try:
+            scaled = self.scaled[size]
+        except KeyError:
+            scaled = self.scaled[size] = pygame.Surface(size, 0, surface)
+        return pygame.transform.scale(surface, size, scaled)
+
+
+class Compositor:
+    """Track the screen regions redrawn since the last present and update only those
+
+    Idle frames mark nothing, so presenting them costs close to nothing compared to
+    a full display flip.
+    """
+
+    dirty: List[pygame.Rect]
+
+    def __init__(self, screen: pygame.Surface):
+
+        self.bounds = screen.get_rect()
+        self.dirty = []
+
+    def mark(self, rect: Tuple[int, int, int, int]):
+        self.dirty.append(self.bounds.clip(rect))
+
+    def present(self):
+
+        if self.dirty:
+            pygame.display.update(self.dirty)
+            self.dirty = []
+
+
+class TextCache:
+    """Bounded LRU cache of rendered text surfaces keyed by (font size, text, color)
+
+    The surfaces handed out are shared, so callers must only blit them.
+    """
+
+    fonts: Dict[int, pygame.font.Font]
+    surfaces: "OrderedDict[tuple, pygame.Surface]"
+
+    def __init__(self, capacity: int = 256):
+
+        self.capacity = capacity
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+
+    def render(
+        self, size: int, text: str, antialias: bool, color: Tuple[int, int, int]
+    ) -> pygame.Surface:
+
+        key = (size, text, antialias, tuple(color))
+        try:
+            self.surfaces.move_to_end(key)
+            return self.surfaces[key]
+        except KeyError:
+            pass
+        try:
+            font = self.fonts[size]
+        except KeyError:
+            font = self.fonts[size] = pygame.font.SysFont(None, size)
+        surface = self.surfaces[key] = font.render(text, antialias, color)
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def renderer(self, size: int) -> Callable[..., pygame.Surface]:
+        """Drop-in replacement for pygame.font.SysFont(None, size).render"""
+
+        return partial(self.render, size)
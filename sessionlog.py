@@ -0,0 +1,251 @@
+"""Compact binary session log
+
+A log file is a sequence of independent blocks, each a short header followed by a
+zlib-compressed payload. The payload holds a batch of records as columns:
+
+    time_ns  int64    time.monotonic_ns() when the record was logged
+    kind     uint8    index into kinds, the action type
+    task     uint16   index into the block's task (or survey) names
+    x, y     float64  numeric arguments, NaN when unused
+    count    uint32   number of records coalesced into this one
+    extra    int32    index into the block's extra arguments, -1 for none
+
+Each block also stores origin_ns, the wall-clock time (ns since the epoch) of
+monotonic time 0, so logs of several sessions can be appended to one file.
+"""
+
+import json
+import struct
+import zlib
+from collections import namedtuple
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+magic = b"PALG"
+block_header = struct.Struct("<4sI")
+
+kinds = [
+    "Other",
+    "Survey",
+    "RotateRight",
+    "LookUp",
+    "LookDown",
+    "MoveAhead",
+    "MoveBack",
+    "MoveLeft",
+    "MoveRight",
+    "Teleport",
+    "OpenObject",
+    "CloseObject",
+    "ToggleObjectOn",
+    "ToggleObjectOff",
+    "PickupObject",
+    "PutObject",
+    "DropHandObject",
+    "ThrowObject",
+    "SliceObject",
+    "RotateHeldObject",
+    "SetObjectPoses",
+]
+codes = {name: code for code, name in enumerate(kinds)}
+OTHER, SURVEY = codes["Other"], codes["Survey"]
+
+# the argument stored in the x column for each action type
+numeric_fields = dict(
+    RotateRight="degrees",
+    LookUp="degrees",
+    LookDown="degrees",
+    MoveAhead="moveMagnitude",
+    MoveBack="moveMagnitude",
+    MoveLeft="moveMagnitude",
+    MoveRight="moveMagnitude",
+)
+# consecutive records of these types are summed into one
+coalescible = {codes["RotateRight"], codes["LookUp"], codes["LookDown"]}
+
+columns = [
+    ("time_ns", np.int64),
+    ("kind", np.uint8),
+    ("task", np.uint16),
+    ("x", np.float64),
+    ("y", np.float64),
+    ("count", np.uint32),
+    ("extra", np.int32),
+]
+
+# (time_ns, task, kind, x, y, extra) with extra a JSON string or None
+Row = Tuple[int, str, int, float, float, Optional[str]]
+
+SessionColumns = namedtuple(
+    "SessionColumns",
+    ["wall_ns", "time_ns", "kind", "task", "x", "y", "count", "extra", "tasks"],
+)
+
+
+def is_look(args: dict) -> bool:
+    """Whether a Teleport only turns the agent in place, as combined mouse looks do"""
+
+    return (
+        set(args) == {"rotation", "horizon", "standing"}
+        and args["standing"] is True
+        and args["rotation"] == dict(x=0, y=args["rotation"].get("y"), z=0)
+        and isinstance(args["rotation"]["y"], (int, float))
+        and isinstance(args["horizon"], (int, float))
+    )
+
+
+def encode_action(action: dict) -> Tuple[int, float, float, Optional[str]]:
+
+    name = action["action"]
+    kind = codes.get(name, OTHER)
+    args = {k: v for k, v in action.items() if k != "action" or kind == OTHER}
+    x = y = float("nan")
+    field = numeric_fields.get(name)
+    if field is not None and isinstance(args.get(field), (int, float)):
+        x = float(args.pop(field))
+    elif name == "Teleport" and is_look(args):
+        x, y = float(args["rotation"]["y"]), float(args["horizon"])
+        args = {}
+    return kind, x, y, json.dumps(args) if args else None
+
+
+def decode_action(kind: int, x: float, y: float, extra: Optional[str]) -> dict:
+
+    action = dict(action=kinds[kind])
+    x, y = float(x), float(y)
+    if extra is not None:
+        action.update(json.loads(extra))
+    elif kinds[kind] == "Teleport":
+        action.update(rotation=dict(x=0, y=x, z=0), horizon=y, standing=True)
+    if kinds[kind] in numeric_fields and not np.isnan(x):
+        action[numeric_fields[kinds[kind]]] = x
+    return action
+
+
+def coalesce(rows: List[list], row: Row):
+    """Append a row to a pending block, summing it into the last one if possible"""
+
+    t, task, kind, x, y, extra = row
+    if rows and kind in coalescible and extra is None:
+        last = rows[-1]
+        if last[2] == kind and last[1] == task and last[6] is None:
+            last[0] = t
+            last[3] += x
+            last[5] += 1
+            return
+    rows.append([t, task, kind, x, y, 1, extra])
+
+
+def encode_block(rows: List[list], origin_ns: int) -> bytes:
+
+    tasks = list(dict.fromkeys(row[1] for row in rows))
+    task_index = {task: i for i, task in enumerate(tasks)}
+    extras = [row[6] for row in rows if row[6] is not None]
+    has_extra = np.array([row[6] is not None for row in rows], dtype=bool)
+    extra_index = np.full(len(rows), -1, dtype=np.int32)
+    extra_index[has_extra] = np.arange(len(extras))
+    header = json.dumps(dict(rows=len(rows), origin_ns=origin_ns, tasks=tasks))
+    data = [
+        np.array([row[0] for row in rows], dtype=np.int64),
+        np.array([row[2] for row in rows], dtype=np.uint8),
+        np.array([task_index[row[1]] for row in rows], dtype=np.uint16),
+        np.array([row[3] for row in rows], dtype=np.float64),
+        np.array([row[4] for row in rows], dtype=np.float64),
+        np.array([row[5] for row in rows], dtype=np.uint32),
+        extra_index,
+    ]
+    payload = b"".join(
+        [
+            struct.pack("<I", len(header)),
+            header.encode(),
+            *(column.tobytes() for column in data),
+            "\n".join(extras).encode(),
+        ]
+    )
+    compressed = zlib.compress(payload)
+    return block_header.pack(magic, len(compressed)) + compressed
+
+
+def decode_blocks(data: bytes) -> Iterator[Tuple[dict, List[np.ndarray], List[str]]]:
+
+    offset = 0
+    while offset + block_header.size <= len(data):
+        tag, size = block_header.unpack_from(data, offset)
+        if tag != magic:
+            raise ValueError("not a session log block at byte {}".format(offset))
+        offset += block_header.size
+        if offset + size > len(data):
+            break  # the last block was cut short, e.g. by a crash mid-write
+        payload = zlib.decompress(data[offset : offset + size])
+        offset += size
+        (header_size,) = struct.unpack_from("<I", payload)
+        position = 4 + header_size
+        header = json.loads(payload[4:position])
+        data_columns = []
+        for _, dtype in columns:
+            column = np.frombuffer(payload, dtype, header["rows"], position)
+            data_columns.append(column)
+            position += column.nbytes
+        extras = (
+            payload[position:].decode().split("\n") if position < len(payload) else []
+        )
+        yield header, data_columns, extras
+
+
+def is_session_log(log_file: str) -> bool:
+
+    with open(log_file, "rb") as f:
+        return f.read(len(magic)) == magic
+
+
+def load_columns(log_file: str) -> SessionColumns:
+    """Load a whole session log into NumPy arrays
+
+    task indexes into tasks, and extra holds the remaining arguments of each action
+    as a JSON string (None when there are none).
+    """
+
+    with open(log_file, "rb") as f:
+        data = f.read()
+    tasks, task_index = [], {}
+    parts = {name: [] for name, _ in columns}
+    parts["wall_ns"], extras = [], []
+    for header, data_columns, block_extras in decode_blocks(data):
+        for task in header["tasks"]:
+            if task not in task_index:
+                task_index[task] = len(tasks)
+                tasks.append(task)
+        for (name, _), column in zip(columns, data_columns):
+            parts[name].append(column)
+        remap = np.array([task_index[task] for task in header["tasks"]], np.uint16)
+        parts["task"][-1] = remap[parts["task"][-1]]
+        parts["wall_ns"].append(parts["time_ns"][-1] + header["origin_ns"])
+        block_extras = np.array(block_extras + [None], dtype=object)
+        extras.append(block_extras[parts["extra"][-1]])
+
+    def concatenate(arrays: List[np.ndarray], dtype) -> np.ndarray:
+        return np.concatenate(arrays) if arrays else np.zeros(0, dtype)
+
+    return SessionColumns(
+        wall_ns=concatenate(parts["wall_ns"], np.int64),
+        extra=concatenate(extras, object),
+        tasks=tasks,
+        **{name: concatenate(parts[name], dtype) for name, dtype in columns[:-1]},
+    )
+
+
+def iter_records(log: SessionColumns) -> Iterator[Tuple[str, str, Union[dict, int]]]:
+    """Yield (time, task name, action) or (time, survey name, response) per record
+
+    The time is formatted like str(datetime.now()).
+    """
+
+    for i in range(len(log.kind)):
+        time = str(datetime.fromtimestamp(log.wall_ns[i] / 1e9))
+        if log.kind[i] == SURVEY:
+            yield time, log.tasks[log.task[i]], int(log.x[i])
+        else:
+            action = decode_action(log.kind[i], log.x[i], log.y[i], log.extra[i])
+            yield time, log.tasks[log.task[i]], action
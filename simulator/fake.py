@@ -0,0 +1,549 @@
+import pickle
+from copy import deepcopy
+from math import atan2, cos, degrees, hypot, pi, radians, sin
+from time import sleep
+from typing import List, Optional
+
+import numpy as np
+
+from utils import get_floorplan_config
+
+# object properties of the kitchen objects used in the study, by object type
+properties = dict(
+    openable={"Fridge", "Cabinet", "Microwave", "Drawer", "Kettle"},
+    toggleable={"CoffeeMachine", "Microwave", "Toaster", "StoveKnob", "Faucet"},
+    pickupable={
+        "Apple",
+        "Bowl",
+        "Bread",
+        "ButterKnife",
+        "Cup",
+        "DishSponge",
+        "Egg",
+        "Fork",
+        "Glassbottle",
+        "Kettle",
+        "Knife",
+        "Lettuce",
+        "Mug",
+        "Pan",
+        "PaperTowelRoll",
+        "PepperShaker",
+        "Plate",
+        "Pot",
+        "Potato",
+        "SaltShaker",
+        "SoapBottle",
+        "Spatula",
+        "Spoon",
+        "Tomato",
+        "Vase",
+    },
+    moveable={"Chair", "Stool", "DiningTable", "GarbageCan", "ShelvingUnit"},
+    sliceable={"Apple", "Bread", "Lettuce", "Potato", "Tomato"},
+    receptacle={
+        "Bowl",
+        "Cabinet",
+        "Chair",
+        "CoffeeMachine",
+        "CounterTop",
+        "Cup",
+        "DiningTable",
+        "Fridge",
+        "GarbageCan",
+        "Microwave",
+        "Mug",
+        "Pan",
+        "Plate",
+        "Pot",
+        "ShelvingUnit",
+        "Sink",
+        "Stool",
+        "Toaster",
+    },
+    canFillWithLiquid={"Bowl", "Cup", "Kettle", "Mug", "Pot"},
+)
+fixtures = ["CounterTop", "Fridge", "Cabinet", "Sink"]
+floor_id = "Floor|+00.00|+00.00|+00.00"
+
+
+def make_object(object_type: str, name: str, position: dict, rotation: dict) -> dict:
+
+    object_id = "{}|{:+.2f}|{:+.2f}|{:+.2f}".format(
+        object_type, position["x"], position["y"], position["z"]
+    )
+    meta = dict(
+        name=name,
+        objectId=object_id,
+        objectType=object_type,
+        position=dict(position),
+        rotation=dict(rotation),
+        parentReceptacles=[floor_id],
+        isOpen=False,
+        isToggled=False,
+        isPickedUp=False,
+        isSliced=False,
+        isFilledWithLiquid=False,
+        fillLiquid=None,
+        visible=True,
+        axisAlignedBoundingBox=dict(
+            cornerPoints=[
+                [position["x"] + dx, position["y"] + dy, position["z"] + dz]
+                for dx in (-0.1, 0.1)
+                for dy in (-0.1, 0.1)
+                for dz in (-0.1, 0.1)
+            ],
+            size=dict(x=0.2, y=0.2, z=0.2),
+            center=dict(position),
+        ),
+    )
+    for prop, types in properties.items():
+        meta[prop] = object_type in types
+    return meta
+
+
+class FakeEvent:
+    """Stand-in for ai2thor.server.Event with the attributes the project uses"""
+
+    def __init__(self, metadata: dict, frame: Optional[np.ndarray]):
+        self.metadata = metadata
+        self.frame = frame
+
+    def get_object(self, object_id: str) -> Optional[dict]:
+
+        for obj in self.metadata["objects"]:
+            if obj["objectId"] == object_id:
+                return obj
+        return None
+
+
+class FakeController:
+    """Drop-in stand-in for ai2thor.controller.Controller without a simulator
+
+    By default the scene is synthesized from the object poses in floorplans.json
+    and actions are simulated on the metadata with simple kinematics (no physics
+    or collisions); frames are a cheap synthetic image that shifts with the view.
+    With a recording (see EventRecorder), the recorded events are replayed in
+    order instead, whatever action is requested.
+
+    step_latency: seconds a rendered step takes at the initial resolution, to mimic
+                  the simulator's step time
+    render_share: fraction of step_latency spent rendering, which scales with the
+                  number of pixels and is skipped for steps with renderImage=False
+    """
+
+    def __init__(
+        self,
+        scene: str = "FloorPlan10",
+        width: int = 300,
+        height: int = 300,
+        gridSize: float = 0.25,
+        fieldOfView: float = 90,
+        step_latency: float = 0.0,
+        render_share: float = 0.5,
+        recording: Optional[str] = None,
+        **kwargs
+    ):
+
+        self.width = width
+        self.height = height
+        self.grid_size = gridSize
+        self.field_of_view = fieldOfView
+        self.step_latency = step_latency
+        self.render_share = render_share
+        self.initial_pixels = width * height
+        self.step_count = 0
+        self.recorded = None
+        if recording is not None:
+            with open(recording, "rb") as f:
+                self.recorded = pickle.load(f)
+            self.replay_index = 0
+        self.reset(scene)
+
+    def reset(
+        self, scene: str = None, width: int = None, height: int = None, **kwargs
+    ) -> FakeEvent:
+
+        self.scene = scene or self.scene
+        self.width = width or self.width
+        self.height = height or self.height
+        config = get_floorplan_config(self.scene)
+        self.objects = [
+            make_object(
+                pose["objectName"].split("_")[0],
+                pose["objectName"],
+                pose["position"],
+                pose["rotation"],
+            )
+            for pose in config.get("object_poses", [])
+        ]
+        xs = [obj["position"]["x"] for obj in self.objects] or [0.0]
+        zs = [obj["position"]["z"] for obj in self.objects] or [0.0]
+        self.bounds = (min(xs) - 1, max(xs) + 1, min(zs) - 1, max(zs) + 1)
+        center = dict(x=sum(xs) / len(xs), y=0.9, z=sum(zs) / len(zs))
+        for i, object_type in enumerate(fixtures):
+            angle = 2 * pi * i / len(fixtures)
+            position = dict(
+                x=center["x"] + 1.2 * cos(angle),
+                y=0.9,
+                z=center["z"] + 1.2 * sin(angle),
+            )
+            self.objects.append(
+                make_object(object_type, object_type, position, dict(x=0, y=0, z=0))
+            )
+        self.agent = dict(
+            position=dict(center, y=0.9),
+            rotation=dict(x=0.0, y=0.0, z=0.0),
+            cameraHorizon=0.0,
+            isStanding=True,
+        )
+        self.held = None
+        self.make_view()
+        self.last_event = self.make_event("Reset", True)
+        return self.last_event
+
+    def stop(self):
+        pass
+
+    def make_view(self):
+        """Synthetic panorama twice the frame size, cropped by the view direction"""
+
+        self.view = np.empty((2 * self.height, 2 * self.width, 3), dtype=np.uint8)
+        self.view[:, :, 0] = np.linspace(0, 255, 2 * self.width, dtype=np.uint8)
+        self.view[:, :, 1] = np.linspace(0, 255, 2 * self.height, dtype=np.uint8)[
+            :, None
+        ]
+        self.view[:, :, 2] = 128
+
+    def make_event(
+        self,
+        action: str,
+        success: bool,
+        action_return=None,
+        error: str = "",
+        render: bool = True,
+    ) -> FakeEvent:
+
+        metadata = dict(
+            agent=deepcopy(self.agent),
+            objects=deepcopy(self.objects),
+            lastAction=action,
+            lastActionSuccess=success,
+            actionReturn=action_return,
+            errorMessage=error,
+            sceneName=self.scene,
+            screenWidth=self.width,
+            screenHeight=self.height,
+        )
+        return FakeEvent(metadata, self.render() if render else None)
+
+    def render(self) -> np.ndarray:
+
+        shift_x = int(self.agent["rotation"]["y"] / 360 * self.width)
+        shift_y = int((self.agent["cameraHorizon"] + 30) / 90 * self.height)
+        return np.ascontiguousarray(
+            self.view[shift_y : shift_y + self.height, shift_x : shift_x + self.width]
+        )
+
+    def step(self, action=None, **action_args) -> FakeEvent:
+
+        if isinstance(action, dict):
+            action_args = dict(action, **action_args)
+        else:
+            action_args = dict(action_args, action=action)
+        action = action_args.pop("action")
+        render = action_args.pop("renderImage", True)
+        self.step_count += 1
+        if self.step_latency > 0:
+            pixels = self.width * self.height / self.initial_pixels if render else 0
+            share = self.render_share
+            sleep(self.step_latency * (1 - share + share * pixels))
+
+        if self.recorded is not None:
+            recorded = self.recorded[self.replay_index % len(self.recorded)]
+            self.replay_index += 1
+            self.last_event = FakeEvent(
+                recorded["metadata"], recorded["frame"] if render else None
+            )
+            return self.last_event
+
+        try:
+            handler = getattr(self, "do_" + action)
+        except AttributeError:
+            self.last_event = self.make_event(
+                action, False, error="unsupported action: " + action, render=render
+            )
+        else:
+            try:
+                action_return = handler(**action_args)
+            except ValueError as e:
+                self.last_event = self.make_event(
+                    action, False, error=str(e), render=render
+                )
+            else:
+                self.last_event = self.make_event(
+                    action, True, action_return, render=render
+                )
+        return self.last_event
+
+    def get(self, object_id: str) -> dict:
+
+        for obj in self.objects:
+            if obj["objectId"] == object_id:
+                return obj
+        raise ValueError("object not found: {}".format(object_id))
+
+    # navigation
+
+    def move(self, forward: float, right: float):
+
+        yaw = radians(self.agent["rotation"]["y"])
+        x_min, x_max, z_min, z_max = self.bounds
+        position = self.agent["position"]
+        x = position["x"] + forward * sin(yaw) + right * cos(yaw)
+        z = position["z"] + forward * cos(yaw) - right * sin(yaw)
+        if not (x_min <= x <= x_max and z_min <= z <= z_max):
+            raise ValueError("blocked by the scene boundary")
+        position["x"], position["z"] = x, z
+        self.update_held()
+
+    def do_MoveAhead(self, moveMagnitude: float = None, **kwargs):
+        self.move(moveMagnitude or self.grid_size, 0)
+
+    def do_MoveBack(self, moveMagnitude: float = None, **kwargs):
+        self.move(-(moveMagnitude or self.grid_size), 0)
+
+    def do_MoveRight(self, moveMagnitude: float = None, **kwargs):
+        self.move(0, moveMagnitude or self.grid_size)
+
+    def do_MoveLeft(self, moveMagnitude: float = None, **kwargs):
+        self.move(0, -(moveMagnitude or self.grid_size))
+
+    def do_RotateRight(self, degrees: float = 90, **kwargs):
+
+        rotation = self.agent["rotation"]
+        rotation["y"] = (rotation["y"] + degrees) % 360
+        self.update_held()
+
+    def do_RotateLeft(self, degrees: float = 90, **kwargs):
+        self.do_RotateRight(-degrees)
+
+    def look(self, degrees: float):
+
+        horizon = self.agent["cameraHorizon"] + degrees
+        if not -30 <= horizon <= 60:
+            raise ValueError("can't look beyond the camera horizon limits")
+        self.agent["cameraHorizon"] = horizon
+
+    def do_LookDown(self, degrees: float = 30, **kwargs):
+        self.look(degrees)
+
+    def do_LookUp(self, degrees: float = 30, **kwargs):
+        self.look(-degrees)
+
+    def do_Teleport(
+        self,
+        position: dict = None,
+        rotation: dict = None,
+        horizon: float = None,
+        standing: bool = None,
+        **kwargs
+    ):
+
+        if position is not None:
+            self.agent["position"] = dict(position)
+        if rotation is not None:
+            self.agent["rotation"] = dict(x=0.0, y=rotation.get("y", 0.0), z=0.0)
+        if horizon is not None:
+            self.agent["cameraHorizon"] = horizon
+        if standing is not None:
+            self.agent["isStanding"] = standing
+        self.update_held()
+
+    def do_GetReachablePositions(self, **kwargs) -> List[dict]:
+
+        x_min, x_max, z_min, z_max = self.bounds
+        step = max(self.grid_size, 0.25)
+        return [
+            dict(x=x_min + i * step, y=0.9, z=z_min + j * step)
+            for i in range(int((x_max - x_min) / step) + 1)
+            for j in range(int((z_max - z_min) / step) + 1)
+        ]
+
+    def do_ChangeResolution(self, x: int, y: int, **kwargs):
+
+        self.width, self.height = x, y
+        self.make_view()
+
+    def do_Done(self, **kwargs):
+        pass
+
+    # queries
+
+    def looking_at(self, x: float = 0.5, y: float = 0.5) -> Optional[dict]:
+        """The nearest object within a narrow cone around the screen point"""
+
+        position = self.agent["position"]
+        yaw = self.agent["rotation"]["y"] + (x - 0.5) * self.field_of_view
+        best, best_distance = None, 1.5
+        for obj in self.objects:
+            if obj["isPickedUp"] or not obj["visible"]:
+                continue
+            dx = obj["position"]["x"] - position["x"]
+            dz = obj["position"]["z"] - position["z"]
+            distance = hypot(dx, dz)
+            bearing = (degrees(atan2(dx, dz)) - yaw + 180) % 360 - 180
+            if abs(bearing) < 15 and distance < best_distance:
+                best, best_distance = obj, distance
+        return best
+
+    def do_GetObjectInFrame(self, x: float = 0.5, y: float = 0.5, **kwargs) -> str:
+
+        obj = self.looking_at(x, y)
+        if obj is None:
+            raise ValueError("no object at the given point")
+        return obj["objectId"]
+
+    def do_GetCoordinateFromRaycast(
+        self, x: float = 0.5, y: float = 0.5, **kwargs
+    ) -> dict:
+
+        position = self.agent["position"]
+        yaw = radians(self.agent["rotation"]["y"] + (x - 0.5) * self.field_of_view)
+        return dict(x=position["x"] + sin(yaw), y=0.9, z=position["z"] + cos(yaw))
+
+    # object interaction
+
+    def update_held(self):
+
+        if self.held is not None:
+            self.get(self.held)["position"] = self.do_GetCoordinateFromRaycast()
+
+    def do_SetObjectPoses(self, objectPoses: List[dict], **kwargs):
+
+        poses = {pose["objectName"]: pose for pose in objectPoses}
+        for obj in self.objects:
+            if obj["name"] in poses:
+                obj["position"] = dict(poses[obj["name"]]["position"])
+                obj["rotation"] = dict(poses[obj["name"]]["rotation"])
+
+    def do_PickupObject(self, objectId: str, **kwargs):
+
+        obj = self.get(objectId)
+        if self.held is not None or not obj["pickupable"]:
+            raise ValueError("can't pick up {}".format(objectId))
+        obj["isPickedUp"] = True
+        obj["parentReceptacles"] = None
+        self.held = objectId
+        self.update_held()
+
+    def place(self, receptacle: dict):
+
+        obj = self.get(self.held)
+        obj["isPickedUp"] = False
+        obj["parentReceptacles"] = [receptacle["objectId"]]
+        obj["position"] = dict(receptacle["position"])
+        obj["position"]["y"] += 0.1
+        self.held = None
+
+    def do_PutObject(self, objectId: str, forceAction: bool = False, **kwargs):
+
+        receptacle = self.get(objectId)
+        if self.held is None or not (receptacle["receptacle"] or forceAction):
+            raise ValueError("can't put object on {}".format(objectId))
+        self.place(receptacle)
+
+    def do_DropHandObject(self, **kwargs):
+
+        if self.held is None:
+            raise ValueError("nothing in hand")
+        self.place(dict(objectId=floor_id, position=self.get(self.held)["position"]))
+
+    def do_ThrowObject(self, moveMagnitude: float = 0, **kwargs):
+        self.do_DropHandObject()
+
+    def do_RotateHeldObject(self, **kwargs):
+
+        if self.held is None:
+            raise ValueError("nothing in hand")
+
+    def do_SliceObject(self, objectId: str, forceAction: bool = False, **kwargs):
+
+        obj = self.get(objectId)
+        has_knife = self.held is not None and "Knife" in self.held
+        if not obj["sliceable"] or obj["isSliced"] or not (has_knife or forceAction):
+            raise ValueError("can't slice {}".format(objectId))
+        obj["isSliced"] = True
+        obj["visible"] = False
+        for i in range(3):
+            position = dict(obj["position"], x=obj["position"]["x"] + 0.03 * i)
+            piece = make_object(
+                obj["objectType"] + "Sliced",
+                "{}_Slice_{}".format(obj["name"], i + 1),
+                position,
+                obj["rotation"],
+            )
+            piece["objectId"] = "{}|{}Sliced_{}".format(
+                objectId, obj["objectType"], i + 1
+            )
+            piece["pickupable"] = True
+            piece["parentReceptacles"] = obj["parentReceptacles"]
+            self.objects.append(piece)
+
+    def set_flag(self, object_id: str, prop: str, flag: str, value, force: bool):
+
+        obj = self.get(object_id)
+        if not (obj[prop] or force):
+            raise ValueError("{} is not {}".format(object_id, prop))
+        obj[flag] = value
+
+    def do_OpenObject(self, objectId: str, forceAction: bool = False, **kwargs):
+        self.set_flag(objectId, "openable", "isOpen", True, forceAction)
+
+    def do_CloseObject(self, objectId: str, forceAction: bool = False, **kwargs):
+        self.set_flag(objectId, "openable", "isOpen", False, forceAction)
+
+    def do_ToggleObjectOn(self, objectId: str, forceAction: bool = False, **kwargs):
+
+        self.set_flag(objectId, "toggleable", "isToggled", True, forceAction)
+        # like ai2thor, a running coffee machine fills the mug placed in it
+        if "CoffeeMachine" in objectId:
+            for obj in self.objects:
+                if obj["objectType"] == "Mug" and objectId in (
+                    obj["parentReceptacles"] or []
+                ):
+                    obj["isFilledWithLiquid"] = True
+                    obj["fillLiquid"] = "coffee"
+
+    def do_ToggleObjectOff(self, objectId: str, forceAction: bool = False, **kwargs):
+        self.set_flag(objectId, "toggleable", "isToggled", False, forceAction)
+
+    def do_FillObjectWithLiquid(
+        self, objectId: str, fillLiquid: str, forceAction: bool = False, **kwargs
+    ):
+
+        self.set_flag(objectId, "canFillWithLiquid", "isFilledWithLiquid", True, True)
+        self.get(objectId)["fillLiquid"] = fillLiquid
+
+
+class EventRecorder:
+    """Wrap a controller and record every event it returns for FakeController"""
+
+    def __init__(self, controller):
+
+        self.controller = controller
+        self.events = []
+
+    def __getattr__(self, name: str):
+        return getattr(self.controller, name)
+
+    def step(self, action=None, **action_args):
+
+        event = self.controller.step(action, **action_args)
+        self.events.append(dict(metadata=deepcopy(event.metadata), frame=event.frame))
+        return event
+
+    def save(self, path: str):
+
+        with open(path, "wb") as f:
+            pickle.dump(self.events, f)
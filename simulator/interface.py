@@ -1,18 +1,19 @@
-import os
 import pdb
 import queue as _queue
 import sys
 import time
 from multiprocessing import Process, Queue
-from pprint import pprint
-from typing import Callable, List, Tuple
+from typing import Callable, List, Optional, Tuple
 
-import _io
 import ai2thor
+import numpy as np
 import pygame
 from ai2thor.controller import Controller
 from ai2thor.platform import CloudRendering
 
+from pipeline import RenderOnDemand
+from tracing import DEBUG, Tracer
+
 
 class Interface(Process):
     """Async interface for AI2Thor simulator user study
@@ -21,7 +22,7 @@ class Interface(Process):
            takes a while to process
     state: a cross-process placeholder for the state (implemented as size 1 queue)
     hint: a cross-process queue for the hints generated
-    print_output: redirected output stream
+    tracer: traces steps and hints to stdout in debug mode, None otherwise
     """
 
     white = (255, 255, 255)
@@ -45,7 +46,7 @@ class Interface(Process):
     model: Callable[[ai2thor.server.Event], str]
     state: Queue
     hint: Queue
-    print_output: _io.TextIOWrapper
+    tracer: Optional[Tracer]
 
     def _show_instructions(
         self,
@@ -158,15 +159,19 @@ class Interface(Process):
         pygame.display.flip()
 
         # ai2thor init
-        controller = Controller(
-            platform=CloudRendering,
-            scene=floor_plan,
-            width=width,
-            height=height,
-            # rotateStepDegrees=30,
-            gridSize=0.05,
-            snapToGrid=False,
-            fieldOfView=60,
+        self.tracer = Tracer(DEBUG, sys.stdout) if debug else None
+        controller = RenderOnDemand(
+            Controller(
+                platform=CloudRendering,
+                scene=floor_plan,
+                width=width,
+                height=height,
+                # rotateStepDegrees=30,
+                gridSize=0.05,
+                snapToGrid=False,
+                fieldOfView=60,
+            ),
+            tracer=self.tracer,
         )
         state = controller.step(action="Teleport")  # get initial state
         openables = {
@@ -189,17 +194,17 @@ class Interface(Process):
             standing=agent["isStanding"],
             horizon=agent["cameraHorizon"],
         )
-        screen.blit(
-            pygame.surfarray.make_surface(state.frame.transpose(1, 0, 2)),
-            (0, offset),
-        )
+        # persistent surface backed by a buffer, each frame is one contiguous copy
+        frame_buffer = np.empty((height, width, 3), dtype=np.uint8)
+        frame_surface = pygame.image.frombuffer(frame_buffer, (width, height), "RGB")
+        np.copyto(frame_buffer, state.frame)
+        screen.blit(frame_surface, (0, offset))
         # pygame.display.flip()
         self._update_display_with_circle(screen, center, offset // 8, Interface.white)
         pygame.mouse.set_pos(center)
 
         # start game loop
         self.model = model
-        self.print_output = sys.stdout if debug else open(os.devnull, "w")
         self.start()
         print("starting loop in:", self.pid)
 
@@ -266,7 +271,6 @@ class Interface(Process):
                         finally:
                             if action is not None:
                                 state = controller.step(**action)
-                                pprint(state, stream=self.print_output)
 
                     # handle object interaction with mouse
                     elif event.type == pygame.MOUSEBUTTONDOWN:
@@ -286,7 +290,6 @@ class Interface(Process):
                                     state = controller.step(
                                         action=action, objectId=objectId
                                     )
-                                    pprint(state, stream=self.print_output)
                                     if state.metadata["lastActionSuccess"]:
                                         if action == "PutObject":
                                             has_knife = False
@@ -316,10 +319,8 @@ class Interface(Process):
 
                 # update display
                 if state is not old_state:
-                    screen.blit(
-                        pygame.surfarray.make_surface(state.frame.transpose(1, 0, 2)),
-                        (0, offset),
-                    )
+                    np.copyto(frame_buffer, state.frame)
+                    screen.blit(frame_surface, (0, offset))
                     try:
                         self.state.get_nowait()
                     except _queue.Empty:
@@ -330,7 +331,6 @@ class Interface(Process):
                         screen, center, offset // 8, Interface.white
                     )
                     pygame.display.flip()
-                    pprint(state, stream=self.print_output)
 
                 # update hint
                 try:
@@ -341,9 +341,8 @@ class Interface(Process):
                     screen.fill(Interface.white, banner)
                     text = mktext(hint, True, Interface.black)
                     screen.blit(text, (0, 0))
-                    pprint(
-                        "updating hint to: {}".format(hint), stream=self.print_output
-                    )
+                    if self.tracer is not None:
+                        self.tracer.emit("hint", hint=hint)
                     pygame.display.flip()
 
         except KeyboardInterrupt:
@@ -363,20 +362,19 @@ class Interface(Process):
 
         state = self.state.get()
         while state is not None:  # sync with foreground process
-            pprint("[background] get new state", stream=self.print_output)
             t = time.time()
             hint = self.model(state)
             self.hint.put(hint)
-            pprint(
-                "[background] give new hint {} after {:.3f}s".format(
-                    hint, time.time() - t
-                ),
-                stream=self.print_output,
-            )
+            if self.tracer is not None:
+                self.tracer.emit(
+                    "model", hint=hint, ms=round(1000 * (time.time() - t), 3)
+                )
             state = self.state.get()
 
 
 if __name__ == "__main__":
+    # run from the repository root, whose modules this one imports:
+    #     python -m simulator.interface
 
     import random
 
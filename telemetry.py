@@ -0,0 +1,117 @@
+"""Per-call telemetry of the worker processes that compute banners and checklists
+
+Every call of a worker function is timed in the worker and reported along with its
+result: how long the state waited in the queue, how long the function ran, and how
+many states were dropped as stale because a newer one had arrived. The main process
+adds the age of the result when it is picked up for display. Latencies go into
+fixed log-spaced histograms, so the telemetry of a task stays small.
+"""
+
+import json
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, Optional
+
+# upper bin edges in seconds, the last bin holds everything slower
+bin_edges = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0]
+
+# time.monotonic() when the state was sent, picked up and done with, and the number
+# of older states skipped in favour of it
+CallStats = namedtuple("CallStats", ["sent", "started", "finished", "skipped"])
+
+
+def function_name(func: callable) -> str:
+    """The model, checklist or tutorial behind a worker function"""
+
+    return getattr(func, "__qualname__", None) or type(func).__name__
+
+
+class LatencyHistogram:
+    def __init__(self):
+
+        self.counts = [0] * (len(bin_edges) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+
+        self.counts[bisect_left(bin_edges, seconds)] += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """Upper edge of the bin holding the q-quantile, capped by the maximum"""
+
+        rank, seen = q * sum(self.counts), 0
+        for edge, count in zip(bin_edges + [self.max], self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(edge, self.max)
+        return 0.0
+
+    def summary(self) -> dict:
+
+        count = sum(self.counts)
+        return dict(
+            count=count,
+            mean_ms=1000 * self.total / count if count else 0.0,
+            p50_ms=1000 * self.quantile(0.5),
+            p95_ms=1000 * self.quantile(0.95),
+            max_ms=1000 * self.max,
+            counts=self.counts,
+        )
+
+
+class WorkerTelemetry:
+    """Telemetry of one worker function over a task, gathered in the main process"""
+
+    def __init__(self, function: str):
+
+        self.function = function
+        self.calls = 0
+        self.skipped = 0
+        self.queue_wait = LatencyHistogram()
+        self.compute = LatencyHistogram()
+        self.result_age = LatencyHistogram()
+
+    def record(self, call: CallStats, received: float):
+
+        self.calls += 1
+        self.skipped += call.skipped
+        self.queue_wait.add(call.started - call.sent)
+        self.compute.add(call.finished - call.started)
+        self.result_age.add(received - call.finished)
+
+    def summary(self) -> dict:
+
+        return dict(
+            function=self.function,
+            calls=self.calls,
+            skipped=self.skipped,
+            queue_wait=self.queue_wait.summary(),
+            compute=self.compute.summary(),
+            result_age=self.result_age.summary(),
+        )
+
+
+def write_telemetry(
+    path: str,
+    task: str,
+    workers: Dict[str, WorkerTelemetry],
+    pacing: Optional[dict] = None,
+):
+    """Append the telemetry of a task as one JSON line, workers keyed by role
+
+    pacing: the frame pacing report of the task (see pipeline.FrameScheduler)
+    """
+
+    entry = dict(
+        time=str(datetime.now()),
+        task=task,
+        bin_edges_ms=[1000 * edge for edge in bin_edges],
+        workers={role: telemetry.summary() for role, telemetry in workers.items()},
+        pacing=pacing,
+    )
+    with open(path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
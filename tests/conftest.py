@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the modules under test live at the repository root, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# pygame runs headless
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
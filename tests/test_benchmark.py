@@ -0,0 +1,36 @@
+import pygame
+
+from benchmark import generate_script, run_benchmark
+from checklist import SandwichChecklist
+from models import get_model
+
+floor_plan = "FloorPlan5"
+
+
+def benchmark(script) -> dict:
+
+    return run_benchmark(
+        floor_plan,
+        script,
+        0.01,
+        get_model(floor_plan, "coffee_first"),
+        SandwichChecklist(),
+        clock_speed=100.0,
+    )
+
+
+def test_scripted_session_plays_back():
+
+    report = benchmark(generate_script(60))
+    assert report["script_frames"] == 60
+    assert report["tasks_run"] == ["benchmark"]
+    assert report["controller_steps"] > 0
+
+
+def test_n_retries_the_task():
+
+    # N is ignored for the first 250 ms of a task, each look steps for 10 ms
+    look = [("mouse", 4, 0)]
+    script = [look] * 60 + [[("key", pygame.K_n)]] + [look] * 10
+    report = benchmark(script)
+    assert report["tasks_run"] == ["benchmark", "benchmarktrial-1"]
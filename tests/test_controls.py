@@ -0,0 +1,60 @@
+from controls import InputCoalescer
+
+agent = dict(rotation=dict(x=0, y=350.0, z=0), cameraHorizon=50.0, isStanding=True)
+
+
+def test_key_repeats_sum_into_one_step_per_axis():
+
+    coalescer = InputCoalescer(grid_size=0.25)
+    for action in ["MoveAhead", "MoveAhead", "MoveLeft", "MoveAhead", "MoveBack"]:
+        coalescer.add_move(dict(action=action))
+    assert coalescer.flush(agent) == [
+        dict(action="MoveAhead", moveMagnitude=0.5),
+        dict(action="MoveLeft", moveMagnitude=0.25),
+    ]
+    assert coalescer.empty()
+
+
+def test_opposite_keys_cancel_out():
+
+    coalescer = InputCoalescer(grid_size=0.25)
+    coalescer.add_move(dict(action="MoveRight", moveMagnitude=0.1))
+    coalescer.add_move(dict(action="MoveLeft", moveMagnitude=0.1))
+    assert coalescer.flush(agent) == []
+
+
+def test_mouse_along_one_axis():
+
+    coalescer = InputCoalescer(grid_size=0.25, mouse_fraction=0.5)
+    coalescer.add_mouse(4, 0)
+    coalescer.add_mouse(6, 0)
+    assert coalescer.flush(agent) == [dict(action="RotateRight", degrees=5.0)]
+    coalescer.add_mouse(0, -8)
+    assert coalescer.flush(agent) == [dict(action="LookUp", degrees=4.0)]
+
+
+def test_mouse_along_both_axes_teleports_within_the_horizon_range():
+
+    coalescer = InputCoalescer(grid_size=0.25, mouse_fraction=0.5)
+    coalescer.add_mouse(40, 30)
+    assert coalescer.flush(agent) == [
+        dict(
+            action="Teleport",
+            rotation=dict(x=0, y=10.0, z=0),
+            horizon=60,
+            standing=True,
+        )
+    ]
+
+
+def test_detach_hands_over_pending_input():
+
+    coalescer = InputCoalescer(grid_size=0.25)
+    coalescer.add_move(dict(action="MoveBack"))
+    coalescer.add_mouse(2, 0)
+    detached = coalescer.detach()
+    assert coalescer.empty() and not detached.empty()
+    assert [action["action"] for action in detached.flush(agent)] == [
+        "MoveBack",
+        "RotateRight",
+    ]
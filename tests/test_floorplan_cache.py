@@ -0,0 +1,46 @@
+import math
+
+import numpy as np
+import pytest
+
+from floorplan_cache import distance_field, reachable_grid
+
+grid_size = 0.25
+
+
+def positions(cells) -> np.ndarray:
+
+    return np.array([(i * grid_size, 0.9, j * grid_size) for i, j in cells])
+
+
+def test_open_floor_is_walked_straight_and_diagonally():
+
+    cells = [(i, j) for i in range(4) for j in range(3)]
+    cell_size, _, grid_index = reachable_grid(positions(cells), grid_size)
+    distance = distance_field(grid_index, cell_size, np.array([0]))
+
+    assert cell_size == grid_size
+    assert distance[cells.index((3, 0))] == pytest.approx(3 * grid_size)
+    assert distance[cells.index((2, 2))] == pytest.approx(2 * math.sqrt(2) * grid_size)
+
+
+def test_wall_is_walked_around():
+
+    # a wall along i = 2 with a gap at j = 4
+    cells = [(i, j) for i in range(5) for j in range(5) if i != 2 or j == 4]
+    cell_size, _, grid_index = reachable_grid(positions(cells), grid_size)
+    distance = distance_field(grid_index, cell_size, np.array([cells.index((0, 0))]))
+
+    # up to the gap and back down, diagonally where possible
+    detour = 2 * (2 * math.sqrt(2) + 2) * grid_size
+    assert distance[cells.index((4, 0))] == pytest.approx(detour, rel=1e-6)
+    assert distance[cells.index((2, 4))] == pytest.approx(detour / 2, rel=1e-6)
+
+
+def test_unreachable_positions_are_infinitely_far():
+
+    cells = [(0, 0), (1, 0), (4, 0)]
+    cell_size, _, grid_index = reachable_grid(positions(cells), grid_size)
+    distance = distance_field(grid_index, cell_size, np.array([0]))
+
+    assert np.isinf(distance[2]) and distance[1] == pytest.approx(grid_size)
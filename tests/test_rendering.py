@@ -0,0 +1,29 @@
+import numpy as np
+
+from rendering import reproject
+
+frame = np.arange(60 * 80 * 3, dtype=np.uint32).reshape(60, 80, 3).astype(np.uint8)
+
+
+def test_no_turn_returns_the_frame():
+
+    assert reproject(frame, 0.0, 0.0, 90) is frame
+    # less than half a pixel of shift
+    assert reproject(frame, 0.1, -0.1, 90) is frame
+
+
+def test_turning_right_shifts_the_view_left():
+
+    # focal length is 30 pixels at 90 degrees vertical field of view
+    shifted = reproject(frame, 45.0, 0.0, 90)
+    assert shifted.shape == frame.shape
+    np.testing.assert_array_equal(shifted[:, :50], frame[:, 30:])
+    # uncovered pixels repeat the edge
+    np.testing.assert_array_equal(shifted[:, 50:], frame[:, 79:80].repeat(30, 1))
+
+
+def test_looking_up_shifts_the_view_down():
+
+    shifted = reproject(frame, 0.0, -45.0, 90)
+    np.testing.assert_array_equal(shifted[30:], frame[:30])
+    np.testing.assert_array_equal(shifted[:30], frame[:1].repeat(30, 0))
@@ -0,0 +1,77 @@
+import math
+
+import sessionlog
+from utils import Logger, read_log
+
+actions = [
+    dict(action="MoveAhead", moveMagnitude=0.75),
+    dict(action="RotateRight", degrees=-12.5),
+    dict(
+        action="Teleport",
+        rotation=dict(x=0, y=90.0, z=0),
+        horizon=15.0,
+        standing=True,
+    ),
+    dict(action="OpenObject", objectId="Fridge|-2.1|0|1.5"),
+    dict(action="Crouch"),
+]
+
+
+def test_actions_round_trip():
+
+    for action in actions:
+        assert sessionlog.decode_action(*sessionlog.encode_action(action)) == action
+
+
+def test_blocks_round_trip():
+
+    rows = []
+    for t, action in enumerate(actions):
+        sessionlog.coalesce(rows, (t, "task", *sessionlog.encode_action(action)))
+    sessionlog.coalesce(rows, (9, "survey", sessionlog.SURVEY, 4.0, math.nan, None))
+    data = sessionlog.encode_block(rows, origin_ns=123) * 2
+
+    blocks = list(sessionlog.decode_blocks(data))
+    assert len(blocks) == 2
+    header, columns, extras = blocks[0]
+    assert header == dict(rows=len(rows), origin_ns=123, tasks=["task", "survey"])
+    time_ns, kind, task, x, y, count, extra = columns
+    decoded = [
+        sessionlog.decode_action(
+            kind[i], x[i], y[i], extras[extra[i]] if extra[i] >= 0 else None
+        )
+        for i in range(len(actions))
+    ]
+    assert decoded == actions
+    assert list(time_ns) == list(range(len(actions))) + [9]
+    assert kind[-1] == sessionlog.SURVEY and x[-1] == 4.0
+
+
+def test_truncated_block_is_skipped():
+
+    block = sessionlog.encode_block([[0, "task", 5, 0.25, math.nan, 1, None]], 0)
+    assert len(list(sessionlog.decode_blocks(block + block[:-3]))) == 1
+
+
+def test_consecutive_rotations_coalesce():
+
+    rows = []
+    for degrees in [3.0, 4.5, -1.5]:
+        action = dict(action="RotateRight", degrees=degrees)
+        sessionlog.coalesce(rows, (0, "task", *sessionlog.encode_action(action)))
+    assert len(rows) == 1 and rows[0][3] == 6.0 and rows[0][5] == 3
+
+
+def test_logger_starts_each_session_afresh(tmp_path):
+
+    log_file = str(tmp_path / "log.bin")
+    for session in range(2):
+        logger = Logger(log_file)
+        for action in actions:
+            logger.log_action("task", action)
+        logger.log_survey("survey", session)
+        logger.close()
+
+    log = read_log(log_file)
+    assert [action for _, action in log["actions"]["task"]] == actions
+    assert [response for _, response in log["surveys"]["survey"]] == [1]
@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+budget = 0.25  # seconds, as in main.check_startup
+
+
+def import_times(module: str) -> dict:
+    """Cumulative import time in seconds of every module, from -X importtime"""
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def test_main_imports_within_budget():
+
+    seconds = min(import_times("main")["main"] for _ in range(3))
+    assert seconds < budget
+
+
+def test_main_defers_heavy_imports():
+
+    imported = import_times("main")
+    for module in ["ai2thor.controller", "numpy", "pygame"]:
+        assert module not in imported
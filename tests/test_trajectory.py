@@ -0,0 +1,58 @@
+from trajectory import Trajectory, TrajectoryRecorder, diff, flatten, unflatten
+
+
+def metadata(step: int) -> dict:
+
+    return dict(
+        agent=dict(position=dict(x=0.25 * step, y=0.9, z=0.0), isStanding=True),
+        objects=[
+            dict(objectId="Fridge|1", isOpen=step % 2 == 1, parentReceptacles=None),
+            dict(objectId="Mug|2", position=dict(x=1.0, y=0.5, z=-step)),
+        ][: 1 + step % 2],
+        lastActionSuccess=True,
+    )
+
+
+def test_flatten_round_trip():
+
+    for step in range(3):
+        assert unflatten(flatten(metadata(step))) == metadata(step)
+
+
+def test_diff_reports_changed_and_removed_paths():
+
+    old, new = flatten(metadata(1)), flatten(metadata(2))
+    changed, removed = diff(old, new)
+    patched = {path: value for path, value in old.items() if path not in removed}
+    patched.update(changed)
+    assert patched == new and removed
+
+
+def test_recorded_steps_read_back(tmp_path):
+
+    path = str(tmp_path / "task.traj")
+    recorder = TrajectoryRecorder(path, keyframe_every=4)
+    for step in range(10):
+        recorder.record(dict(action="MoveAhead", step=step), metadata(step))
+    recorder.close()
+
+    trajectory = Trajectory(path)
+    assert len(trajectory) == 10
+    # in order, backwards and across keyframes
+    for step in list(range(10)) + [9, 3, 7, 0, -1]:
+        _, action, state = trajectory[step]
+        assert action == dict(action="MoveAhead", step=step % 10)
+        assert state == metadata(step % 10)
+
+
+def test_trajectory_cut_short_keeps_complete_steps(tmp_path):
+
+    path = tmp_path / "task.traj"
+    recorder = TrajectoryRecorder(str(path))
+    for step in range(3):
+        recorder.record(dict(action="Pass"), metadata(step))
+    recorder.close()
+    path.write_bytes(path.read_bytes()[:-5])
+
+    trajectory = Trajectory(str(path))
+    assert len(trajectory) == 2 and trajectory[1][2] == metadata(1)
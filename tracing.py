@@ -0,0 +1,107 @@
+"""Level-gated tracing of controller steps
+
+Tracing is off unless a Tracer is handed out, and code that traces holds None
+otherwise, so the disabled path is a single `is not None` check. Enabled, each
+step becomes one JSON line with the action, whether it succeeded, which objects it
+changed and how long it took, rather than a formatted dump of the whole Event.
+
+    info   one record per step, changed objects by objectId
+    debug  also the changed fields of those objects and the agent pose
+"""
+
+import json
+import sys
+from time import monotonic
+from typing import Dict, Optional, TextIO, Tuple
+
+levels = dict(off=0, info=1, debug=2)
+INFO, DEBUG = levels["info"], levels["debug"]
+
+# object fields compared between steps to find what an action changed
+tracked_fields = [
+    "position",
+    "rotation",
+    "isOpen",
+    "isToggled",
+    "isPickedUp",
+    "isSliced",
+    "isFilledWithLiquid",
+    "parentReceptacles",
+]
+
+
+def object_states(metadata: dict) -> Dict[str, Tuple]:
+
+    return {
+        obj["objectId"]: tuple(
+            json.dumps(obj.get(field), sort_keys=True) for field in tracked_fields
+        )
+        for obj in metadata.get("objects", [])
+    }
+
+
+class Tracer:
+    def __init__(self, level: int = INFO, stream: Optional[TextIO] = None):
+
+        self.level = level
+        self.stream = stream or sys.stderr
+        self.previous = None  # object states after the last traced step
+
+    def emit(self, kind: str, **fields):
+
+        fields = dict(kind=kind, time=round(monotonic(), 6), **fields)
+        self.stream.write(json.dumps(fields, default=str) + "\n")
+
+    def start_task(self, **fields):
+        """Trace the start of a task, whose first step is compared to nothing"""
+
+        self.previous = None
+        self.emit("task", **fields)
+
+    def step(self, action: dict, event, seconds: float):
+        """Trace a controller step that took seconds and returned event"""
+
+        metadata = event.metadata
+        states = object_states(metadata)
+        previous = self.previous if self.previous is not None else states
+        changed = sorted(
+            object_id
+            for object_id in states.keys() | previous.keys()
+            if states.get(object_id) != previous.get(object_id)
+        )
+        self.previous = states
+        record = dict(
+            action=action,
+            success=metadata.get("lastActionSuccess"),
+            error=metadata.get("errorMessage") or None,
+            changed=changed,
+            ms=round(1000 * seconds, 3),
+        )
+        if self.level >= DEBUG:
+            record["changes"] = {
+                object_id: {
+                    field: json.loads(value)
+                    for field, value, old in zip(
+                        tracked_fields,
+                        states.get(object_id, ("null",) * len(tracked_fields)),
+                        previous.get(object_id, ("null",) * len(tracked_fields)),
+                    )
+                    if value != old
+                }
+                for object_id in changed
+            }
+            record["agent"] = {
+                key: metadata.get("agent", {}).get(key)
+                for key in ["position", "rotation", "cameraHorizon"]
+            }
+        self.emit("step", **record)
+
+
+def make_tracer(
+    level: str = "off", stream: Optional[TextIO] = None
+) -> Optional[Tracer]:
+    """A tracer at the named level (see levels), None when off"""
+
+    if levels[level] == levels["off"]:
+        return None
+    return Tracer(levels[level], stream)
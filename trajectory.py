@@ -0,0 +1,160 @@
+"""Per-step simulator metadata stored as keyframes plus field-level deltas
+
+A trajectory file is a sequence of records, each a (kind, size) header followed by
+a zlib-compressed JSON document with the step index, wall-clock time, action and
+either the full flattened metadata (a keyframe) or only the fields that changed
+since the previous step (a delta). Reading a step decompresses the keyframe at or
+before it and the deltas in between.
+
+Metadata is flattened into "/"-separated paths, with objects keyed by objectId so
+an object added or removed (e.g. by slicing) only touches its own fields.
+"""
+
+import json
+import struct
+import zlib
+from bisect import bisect_right
+from time import time
+from typing import Any, Dict, List, Tuple
+
+KEYFRAME, DELTA = 0, 1
+record_header = struct.Struct("<BI")
+
+
+def flatten(metadata: dict) -> Dict[str, Any]:
+    def walk(value: Any, path: str):
+        if isinstance(value, dict) and value:
+            for key, item in value.items():
+                walk(item, path + "/" + key if path else key)
+        else:
+            flat[path] = value
+
+    flat = {}
+    for key, value in metadata.items():
+        if key == "objects":
+            for obj in value:
+                walk(obj, "objects/" + obj["objectId"])
+        else:
+            walk(value, key)
+    return flat
+
+
+def unflatten(flat: Dict[str, Any]) -> dict:
+
+    metadata, objects = {}, {}
+    for path, value in flat.items():
+        keys = path.split("/")
+        if keys[0] == "objects":
+            node = objects.setdefault(keys[1], {})
+            keys = keys[2:]
+        else:
+            node = metadata
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+        node[keys[-1]] = value
+    metadata["objects"] = list(objects.values())
+    return metadata
+
+
+def diff(old: Dict[str, Any], new: Dict[str, Any]) -> Tuple[dict, List[str]]:
+    """Fields of new that differ from old, and paths of old that are gone"""
+
+    changed = {
+        path: value
+        for path, value in new.items()
+        if path not in old or old[path] != value
+    }
+    removed = [path for path in old if path not in new]
+    return changed, removed
+
+
+class TrajectoryRecorder:
+    """Record every controller step of a task for replay
+
+    A full keyframe is written every keyframe_every steps, the steps in between only
+    store what changed. Used through RenderOnDemand, on the controller thread.
+    """
+
+    def __init__(self, path: str, keyframe_every: int = 100):
+
+        self.file = open(path, "wb")
+        self.keyframe_every = keyframe_every
+        self.steps = 0
+        self.previous = None
+
+    def record(self, action: dict, metadata: dict):
+
+        flat = flatten(metadata)
+        entry = dict(step=self.steps, time=time(), action=action)
+        if self.steps % self.keyframe_every == 0:
+            kind, entry["state"] = KEYFRAME, flat
+        else:
+            kind = DELTA
+            entry["changed"], entry["removed"] = diff(self.previous, flat)
+        data = zlib.compress(json.dumps(entry, default=str).encode())
+        self.file.write(record_header.pack(kind, len(data)))
+        self.file.write(data)
+        self.previous = flat
+        self.steps += 1
+
+    def close(self):
+        self.file.close()
+
+
+class Trajectory:
+    """Random access to the steps of a recorded trajectory
+
+    trajectory[i] returns (time, action, metadata) of step i.
+    """
+
+    def __init__(self, path: str):
+
+        with open(path, "rb") as f:
+            self.data = f.read()
+        # only the record headers are read up front
+        self.offsets, self.keyframes = [], []
+        offset = 0
+        while offset + record_header.size <= len(self.data):
+            kind, size = record_header.unpack_from(self.data, offset)
+            if offset + record_header.size + size > len(self.data):
+                break  # cut short while recording
+            if kind == KEYFRAME:
+                self.keyframes.append(len(self.offsets))
+            self.offsets.append(offset)
+            offset += record_header.size + size
+        self.cache = (None, None)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def entry(self, step: int) -> dict:
+
+        kind, size = record_header.unpack_from(self.data, self.offsets[step])
+        start = self.offsets[step] + record_header.size
+        return json.loads(zlib.decompress(self.data[start : start + size]))
+
+    def __getitem__(self, step: int) -> Tuple[float, dict, dict]:
+
+        if step < 0:
+            step += len(self)
+        if not 0 <= step < len(self):
+            raise IndexError("step {} out of range".format(step))
+        # continue from the last step read when seeking forward past no keyframe
+        keyframe = self.keyframes[bisect_right(self.keyframes, step) - 1]
+        cached_step, flat = self.cache
+        if cached_step is not None and keyframe <= cached_step <= step:
+            start = cached_step + 1
+            flat = dict(flat)
+        else:
+            flat = self.entry(keyframe)["state"]
+            start = keyframe + 1
+        entry = None
+        for i in range(start, step + 1):
+            entry = self.entry(i)
+            flat.update(entry["changed"])
+            for path in entry["removed"]:
+                del flat[path]
+        if entry is None:
+            entry = self.entry(step)
+        self.cache = (step, flat)
+        return entry["time"], entry["action"], unflatten(flat)
@@ -10,7 +10,7 @@ class StepBasedTutorial:
     landing_instruction: str
     instructions: List[str]
     checklist: List[str]
-    init_steps: List[dict]
+    init_floor_plan: str  # floorplans.json entry with the initial scene setup
 
     def __init__(self):
 
@@ -18,59 +18,74 @@ class StepBasedTutorial:
         self.current_step = 0
         self.total_steps = len(self.instructions)
         self.completed = False
+        # the step predicates, looked up once
+        self.steps = []
+        while len(self.steps) < self.total_steps and hasattr(
+            self, "step{}".format(len(self.steps))
+        ):
+            self.steps.append(getattr(self, "step{}".format(len(self.steps))))
 
-    def banner_func(self, state) -> str:
-
-        if self.completed:
-            sleep(1.5)
-            return None
+    def advance(self, state):
+        """Move past every step the state completes, the first state only starts"""
 
         if self.initialized:
-            res = getattr(self, "step{}".format(self.current_step))(state)
-            try:
-                while res and self.current_step < self.total_steps:
-                    self.current_step += 1
-                    res = getattr(self, "step{}".format(self.current_step))(state)
-            except AttributeError:
-                self.completed = True
+            for step in self.steps[self.current_step :]:
+                if not step(state):
+                    break
+                self.current_step += 1
+            self.completed = self.current_step == len(self.steps)
         else:
             self.initialized = True
             self.start_state = state
 
+    def banner_text(self) -> str:
+
         try:
             return self.instructions[self.current_step]
         except IndexError:
             return "Completed!"
 
-    def checklist_func(self, state) -> Optional[List[DecoratedString]]:
+    def checklist_items(self) -> List[DecoratedString]:
+
+        return [
+            DecoratedString(item, Color.green if i < self.current_step else Color.red)
+            for i, item in enumerate(self.checklist)
+        ]
+
+    def __call__(self, state) -> Optional[Tuple[str, List[DecoratedString]]]:
+        """Banner and checklist from a single evaluation of the steps"""
 
         if self.completed:
             sleep(1.5)
             return None
 
-        if self.initialized:
-            res = getattr(self, "step{}".format(self.current_step))(state)
-            try:
-                while res and self.current_step < self.total_steps:
-                    self.current_step += 1
-                    res = getattr(self, "step{}".format(self.current_step))(state)
-            except AttributeError:
-                self.completed = True
-        else:
-            self.initialized = True
-            self.start_state = state
+        self.advance(state)
+        return self.banner_text(), self.checklist_items()
 
-        return [
-            DecoratedString(item, Color.green if i < self.current_step else Color.red)
-            for i, item in enumerate(self.checklist)
-        ]
+    def banner_func(self, state) -> str:
+
+        if self.completed:
+            sleep(1.5)
+            return None
+
+        self.advance(state)
+        return self.banner_text()
+
+    def checklist_func(self, state) -> Optional[List[DecoratedString]]:
+
+        if self.completed:
+            sleep(1.5)
+            return None
+
+        self.advance(state)
+        return self.checklist_items()
 
     def as_task(self) -> Task:
         return Task(
             name=str(self.__class__),
-            banner_func=self.banner_func,
-            checklist_func=self.checklist_func,
-            init_steps=self.init_steps,
+            banner_func=self,
+            checklist_func=None,
+            init_steps=get_init_steps(self.init_floor_plan),
             floor_plan="FloorPlan5",
             instructions=[self.landing_instruction],
         )
@@ -86,7 +101,7 @@ class NavigationTutorial(StepBasedTutorial):
         "look around",
         "move around",
     ]
-    init_steps = get_init_steps("FloorPlan5_tutorial_navigation")
+    init_floor_plan = "FloorPlan5_tutorial_navigation"
 
     def get_location(self, state) -> Tuple[float, float]:
 
@@ -129,7 +144,7 @@ class OpenObjectsTutorial(StepBasedTutorial):
         "open fridge",
         "close fridge",
     ]
-    init_steps = get_init_steps("FloorPlan5_tutorial_navigation")
+    init_floor_plan = "FloorPlan5_tutorial_navigation"
 
     def get_location(self, state) -> Tuple[float, float]:
 
@@ -197,7 +212,7 @@ class PickObjectsTutorial(StepBasedTutorial):
         "put bread on plate",
         "pick up plate",
     ]
-    init_steps = get_init_steps("FloorPlan5_tutorial_objects")
+    init_floor_plan = "FloorPlan5_tutorial_objects"
 
     def step0(self, state):
         return Checklist.is_picked_up(state, "Bread")
@@ -243,7 +258,7 @@ class CoffeeTutorial(StepBasedTutorial):
         "pick up coffee mug",
         "put coffee near stool",
     ]
-    init_steps = get_init_steps("FloorPlan5_tutorial_coffee")
+    init_floor_plan = "FloorPlan5_tutorial_coffee"
 
     def step0(self, state):
         return Checklist.is_picked_up(state, "Mug")
@@ -277,9 +292,11 @@ class CoffeeTutorial(StepBasedTutorial):
         return Checklist.is_put_down(state, "Mug") and near_stool
 
 
-tutorials = [
-    NavigationTutorial().as_task(),
-    OpenObjectsTutorial().as_task(),
-    PickObjectsTutorial().as_task(),
-    CoffeeTutorial().as_task(),
-]
+def get_tutorials() -> List[Task]:
+
+    return [
+        NavigationTutorial().as_task(),
+        OpenObjectsTutorial().as_task(),
+        PickObjectsTutorial().as_task(),
+        CoffeeTutorial().as_task(),
+    ]
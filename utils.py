@@ -1,10 +1,37 @@
+import errno
+import importlib.util
 import json
+import os
+import queue as _queue
+import sys
 from collections import namedtuple
-from datetime import datetime
+from functools import lru_cache
 from multiprocessing import Process, Queue
-from types import SimpleNamespace
+from threading import Event, Thread
+from time import monotonic, monotonic_ns, time_ns
+from types import ModuleType, SimpleNamespace
 from typing import List, Tuple
 
+from telemetry import CallStats, WorkerTelemetry, function_name
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Import a module on first attribute access, to keep startup fast"""
+
+    try:
+        return sys.modules[name]
+    except KeyError:
+        pass
+    spec = importlib.util.find_spec(name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+sessionlog = lazy_import("sessionlog")
+
 Color = SimpleNamespace(
     white=(255, 255, 255),
     black=(0, 0, 0),
@@ -16,29 +43,131 @@ Color = SimpleNamespace(
 
 
 class Logger:
-    def __init__(self, log_file: str):
+    """Binary session log (see sessionlog for the format)
+
+    Each Logger starts its log file afresh, then appends to it for the session.
+    Actions are encoded by the caller and handed to a writer thread through a
+    bounded queue, so logging costs the same however long the session is and memory
+    stays bounded. The writer coalesces consecutive rotations and writes compressed
+    blocks, each synced to disk, save() waits for everything logged so far.
+    """
+
+    def __init__(
+        self,
+        log_file: str,
+        block_rows: int = 1024,
+        sync_interval: float = 1.0,
+        max_pending: int = 4096,
+    ):
+        """
+        block_rows: records per block at most
+        sync_interval: longest time in seconds a record waits to be written
+        max_pending: records queued for the writer before logging blocks
+        """
+
         self.log_file = log_file
-        self.actions = {}
-        self.surveys = {}
+        self.block_rows = block_rows
+        self.sync_interval = sync_interval
+        self.origin_ns = time_ns() - monotonic_ns()
+        self.records = _queue.Queue(max_pending)
+        self.writer = Thread(target=self.write, daemon=True)
+        self.writer.start()
 
     def log_action(self, task: str, action: dict):
-        try:
-            self.actions[task].append((str(datetime.now()), action))
-        except KeyError:
-            self.actions[task] = [(str(datetime.now()), action)]
+        self.records.put((monotonic_ns(), task, *sessionlog.encode_action(action)))
 
     def log_survey(self, survey: str, res: int):
-        try:
-            self.surveys[survey].append((str(datetime.now()), res))
-        except KeyError:
-            self.surveys[survey] = [(str(datetime.now()), res)]
+        self.records.put(
+            (monotonic_ns(), survey, sessionlog.SURVEY, float(res), float("nan"), None)
+        )
 
     def save(self):
-        json.dump(
-            dict(actions=self.actions, surveys=self.surveys),
-            open(self.log_file, "w"),
-            indent=2
-        )
+        """Block until every record logged so far is written and synced"""
+
+        synced = Event()
+        self.records.put(synced)
+        synced.wait()
+
+    def close(self):
+
+        self.records.put(None)
+        self.writer.join()
+
+    def write(self):
+
+        with open(self.log_file, "wb") as f:
+            rows = []
+            last_sync = monotonic()
+            while True:
+                try:
+                    record = self.records.get(timeout=self.sync_interval)
+                except _queue.Empty:
+                    record = ()  # nothing new, write out what is pending
+                if isinstance(record, tuple) and record:
+                    sessionlog.coalesce(rows, record)
+                    if (
+                        len(rows) < self.block_rows
+                        and monotonic() - last_sync < self.sync_interval
+                    ):
+                        continue
+                if rows:
+                    f.write(sessionlog.encode_block(rows, self.origin_ns))
+                    f.flush()
+                    try:
+                        os.fsync(f.fileno())
+                    except OSError as e:  # e.g. /dev/null cannot be synced
+                        if e.errno != errno.EINVAL:
+                            raise
+                    rows = []
+                last_sync = monotonic()
+                if record is None:
+                    break
+                if isinstance(record, Event):
+                    record.set()
+
+
+def read_log(log_file: str) -> dict:
+    """Load a session log as dict(actions={task: [(time, action)]}, surveys=...)
+
+    Also reads the JSON and JSONL logs of earlier versions. Use
+    sessionlog.load_columns for analysis over whole sessions.
+    """
+
+    actions, surveys = {}, {}
+    if sessionlog.is_session_log(log_file):
+        for time, name, record in sessionlog.iter_records(
+            sessionlog.load_columns(log_file)
+        ):
+            if isinstance(record, dict):
+                actions.setdefault(name, []).append((time, record))
+            else:
+                surveys.setdefault(name, []).append((time, record))
+        return dict(actions=actions, surveys=surveys)
+
+    with open(log_file, "r") as f:
+        text = f.read()
+    # a JSONL log of one record also parses as a whole, tell them apart by keys
+    try:
+        log = json.loads(text)
+    except json.JSONDecodeError:
+        log = None
+    if isinstance(log, dict) and {"actions", "surveys"} <= log.keys():
+        return log
+    for line in text.splitlines():
+        if not line:
+            continue
+        record = json.loads(line)
+        if "action" in record:
+            actions.setdefault(record["task"], []).append(
+                (record["time"], record["action"])
+            )
+        elif "survey" in record:
+            surveys.setdefault(record["survey"], []).append(
+                (record["time"], record["response"])
+            )
+        else:
+            raise ValueError("not a session log record: {}".format(line[:80]))
+    return dict(actions=actions, surveys=surveys)
 
 
 class DecoratedString:
@@ -64,7 +193,11 @@ class DecoratedString:
 
 
 class AsyncFuncWrapper(Process):
-    """Repeatedly run a function in a new process until receives a None input"""
+    """Repeatedly run a function in a new process until receives a None input
+
+    Inputs go in with send() and results come out of receive(), which records the
+    timing of each call in telemetry.
+    """
 
     def __init__(self, func: callable, queue_in: Queue, queue_out: Queue):
 
@@ -73,22 +206,42 @@ class AsyncFuncWrapper(Process):
         self.queue_in = queue_in
         self.queue_out = queue_out
         self.daemon = True
+        self.telemetry = WorkerTelemetry(function_name(func))
         self.start()
 
+    def send(self, inputs):
+        self.queue_in.put((monotonic(), inputs))
+
+    def receive(self, block: bool = True):
+        """The next result, raises queue.Empty if there is none and not blocking"""
+
+        res, call = self.queue_out.get(block)
+        if call is not None:
+            self.telemetry.record(call, monotonic())
+        return res
+
     def run(self):
 
-        inputs = self.queue_in.get()
+        message = self.queue_in.get()
         res = True
-        while inputs is not None and res is not None:
+        skipped = 0
+        while message is not None and res is not None:
+            sent, inputs = message
+            started = monotonic()
             res = self.func(inputs)
-            self.queue_out.put(res)
-            inputs = self.queue_in.get()
-            while not self.queue_in.empty() and inputs is not None:
-                inputs = self.queue_in.get()
+            call = CallStats(sent, started, monotonic(), skipped)
+            self.queue_out.put((res, call))
+            message = self.queue_in.get()
+            skipped = 0
+            while not self.queue_in.empty() and message is not None:
+                message = self.queue_in.get()
+                skipped += 1
         print("Got None, exiting")
-        self.queue_out.put(None)
+        self.queue_out.put((None, None))
 
 
+# without a checklist_func, banner_func returns both (banner, checklist) from one
+# evaluation of the state, in a single worker
 Task = namedtuple(
     "Task",
     [
@@ -103,12 +256,25 @@ Task = namedtuple(
 Survey = namedtuple("Survey", ["name", "question"])
 
 
-floorplans_config = json.load(open("floorplans.json", "r"))
+floorplans_file = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "floorplans.json"
+)
+
+
+@lru_cache(maxsize=None)
+def load_floorplans_config() -> dict:
+
+    with open(floorplans_file, "r") as f:
+        return json.load(f)
+
+
+def get_floorplan_config(floor_plan: str) -> dict:
+    return load_floorplans_config().get(floor_plan, {})
 
 
 def get_init_steps(floor_plan: str) -> List[dict]:
 
-    config = floorplans_config.get(floor_plan, {})
+    config = get_floorplan_config(floor_plan)
     try:
         init_poses = config["object_poses"]
     except KeyError: